@@ -22,6 +22,26 @@ DEFAULT_GRAPHICS_SPHERE_SIZE = 10.0
 DEFAULT_SEGMENTATION_POINT_SIZE = 2.0
 DEFAULT_PUSH_PULL_STEP_SIZE = 1.0
 DEFAULT_INTERPOLATION_COUNT = 5
+DEFAULT_MEMORY_BUDGET_MB = 2048
+DEFAULT_SPARSE_SLICE_MARGIN = 8
+DEFAULT_TEXTURE_UPLOAD_COPIES = 3
+DEFAULT_QUANTIZE_SAMPLE_SLICES = 16
+DEFAULT_INTERACTIVE_VOXEL_COUNT = 256 * 256 * 256
+DEFAULT_INTERACTIVE_PIXEL_COUNT = 256 * 256
+DEFAULT_MAXIMUM_AUTOMATIC_DOWNSAMPLING = 4
+DEFAULT_ZINC_BYTES_PER_PIXEL = 2
+DEFAULT_RESLICE_CACHE_SIZE = 32
+DEFAULT_RESLICE_CACHE_DECIMALS = 6
+DEFAULT_PREFETCH_STEPS = 3
+DEFAULT_AXIS_ALIGNED_TOLERANCE = 1.0e-6
+DEFAULT_BRICK_SIZE = 64
+DEFAULT_BRICK_CACHE_MB = 256
+DEFAULT_HISTOGRAM_STRIDES = [8, 4, 2, 1]
+DEFAULT_WINDOW_FRACTIONS = [0.005, 0.995]
+DEFAULT_WINDOW_TOLERANCE = 0.01
+DEFAULT_THUMBNAIL_SIZE = 64
+DEFAULT_COORDINATE_STORE_CAPACITY = 1024
+DEFAULT_SPATIAL_INDEX_CELL_SIZE = 8.0
 
 ELEMENT_NODE_LABEL_GRAPHIC_NAME = 'label_only'
 IMAGE_PLANE_GRAPHIC_NAME = 'image_plane'
@@ -46,6 +66,12 @@ class ViewMode(object):
     PLANE_ROTATION = 4
     SEGMENT_CURVE = 8
 
+class PointKind(object):
+
+    BASIC = 0
+    CURVE = 1
+    INTERPOLATED = 2
+
 class ViewType(object):
 
     VIEW_3D = 'View 3D'
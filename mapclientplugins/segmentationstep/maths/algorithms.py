@@ -148,6 +148,42 @@ def calculateCentroid(point_on_plane, plane_normal, cuboid_dimensions):
     return plane_centre
 
 
+def calculatePlaneAxisRange(point_on_plane, plane_normal, cuboid_dimensions, axis=2):
+    '''
+    Takes a description of a plane as a point on the plane 
+    and a normal of the plane with a cuboids dimensions, with 
+    one corner defined by [0, 0, 0] and the opposite by 
+    cuboid_dimensions, and calculates the range of values along
+    the given axis covered by the intersection of the plane with
+    the cuboid.  Returns None if the plane misses the cuboid.
+    '''
+    tol = 1e-08
+    dim = cuboid_dimensions
+    others = [i for i in range(3) if i != axis]
+    if abs(plane_normal[axis]) < tol:
+        # The plane is parallel to the axis so it covers the whole range
+        # if it cuts the cuboid at all.
+        corners = [[a, b, c] for a in [0, dim[0]] for b in [0, dim[1]] for c in [0, dim[2]]]
+        distances = [dot(sub(corner, point_on_plane), plane_normal) for corner in corners]
+        if min(distances) > tol or max(distances) < -tol:
+            return None
+        values = [0.0, dim[axis]]
+    else:
+        d = dot(point_on_plane, plane_normal)
+        values = []
+        for a in [0, dim[others[0]]]:
+            for b in [0, dim[others[1]]]:
+                num = d - plane_normal[others[0]] * a - plane_normal[others[1]] * b
+                values.append(num / plane_normal[axis])
+
+    minimum = max(min(values), 0.0)
+    maximum = min(max(values), dim[axis])
+    if minimum > maximum:
+        return None
+
+    return minimum, maximum
+
+
 class CentroidAlgorithm(object):
 
     def __init__(self, xi):
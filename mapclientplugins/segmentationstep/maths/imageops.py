@@ -0,0 +1,159 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from math import ceil
+
+import numpy as np
+
+'''
+A collection of functions that operate on image volumes stored
+as numpy arrays indexed as (z, y, x).
+'''
+
+
+def downsampleVolume(volume, factors):
+    '''
+    Downsample the volume by the given integer (z, y, x) factors
+    taking the mean of each block of voxels.  Partial blocks at the
+    far edges are padded by repeating the edge voxels.  The volume is
+    processed one output slice at a time so that memory mapped
+    volumes are not read into memory all at once.
+    '''
+    fz, fy, fx = [max(1, int(f)) for f in factors]
+    shape = [int(ceil(n / float(f))) for n, f in zip(volume.shape, [fz, fy, fx])]
+    result = np.empty(shape, dtype=volume.dtype)
+    is_integer = np.issubdtype(volume.dtype, np.integer)
+    for k in range(shape[0]):
+        slab = np.asarray(volume[k * fz:(k + 1) * fz], dtype=np.float32)
+        padding = [(0, fz - slab.shape[0]), (0, shape[1] * fy - slab.shape[1]), (0, shape[2] * fx - slab.shape[2])]
+        if any(after for _, after in padding):
+            slab = np.pad(slab, padding, mode='edge')
+        block_mean = slab.reshape(fz, shape[1], fy, shape[2], fx).mean(axis=(0, 2, 4))
+        result[k] = np.rint(block_mean) if is_integer else block_mean
+
+    return result
+
+
+def calculateValueRange(volume):
+    '''
+    Returns the (minimum, maximum) value in the volume, computed one
+    slice at a time.
+    '''
+    minimum = min(np.min(pixels) for pixels in volume)
+    maximum = max(np.max(pixels) for pixels in volume)
+
+    return minimum, maximum
+
+
+def quantizeVolume(volume, value_range):
+    '''
+    Linearly rescale the volume from the given (minimum, maximum)
+    value range onto 8 bit unsigned integers, values outside of the
+    range are clipped.
+    '''
+    minimum, maximum = [float(v) for v in value_range]
+    factor = 255.0 / (maximum - minimum) if maximum > minimum else 0.0
+    result = np.empty(volume.shape, dtype=np.uint8)
+    for k, pixels in enumerate(volume):
+        rescaled = (np.asarray(pixels, dtype=np.float32) - minimum) * factor
+        result[k] = np.rint(np.clip(rescaled, 0.0, 255.0))
+
+    return result
+
+
+def accumulateHistogram(histogram, pixels):
+    '''
+    Add the counts of the unsigned integer pixels to the histogram,
+    which has a bin for every value of the pixel type.  Returns the
+    histogram, a new one if the given histogram is None.
+    '''
+    pixels = np.asarray(pixels)
+    counts = np.bincount(pixels.reshape(-1), minlength=2 ** (8 * pixels.dtype.itemsize))
+
+    return counts if histogram is None else histogram + counts
+
+
+def calculateWindow(histogram, fractions):
+    '''
+    Returns the (low, high) intensity window between the values below
+    which the given (lower, upper) fractions of the histogram counts
+    lie, the window is at least one value wide.
+    '''
+    cumulative = np.cumsum(histogram)
+    total = cumulative[-1]
+    low = int(np.searchsorted(cumulative, fractions[0] * total, side='right'))
+    high = int(np.searchsorted(cumulative, fractions[1] * total, side='left'))
+
+    return low, max(high, low + 1)
+
+
+def applyWindow(pixels, window):
+    '''
+    Linearly rescale the unsigned integer pixels so that the (low,
+    high) intensity window covers the full range of the pixel type,
+    values outside of the window are clipped.
+    '''
+    low, high = [float(v) for v in window]
+    maximum = np.iinfo(pixels.dtype).max
+    rescaled = (np.asarray(pixels, dtype=np.float32) - low) * (maximum / (high - low))
+
+    return np.rint(np.clip(rescaled, 0.0, maximum)).astype(pixels.dtype)
+
+
+def makeThumbnail(pixels, size):
+    '''
+    Downsample the (y, x) pixels by the smallest integer factor that
+    brings the larger side within size pixels.
+    '''
+    factor = int(ceil(max(pixels.shape) / float(size)))
+    if factor <= 1:
+        return np.array(pixels)
+
+    return downsampleVolume(np.asarray(pixels)[np.newaxis], [1, factor, factor])[0]
+
+
+def buildCoarseLevel(volume, maximum_voxels, subsample=False):
+    '''
+    Downsample the volume by the smallest power of two, applied along
+    every axis longer than one voxel, that leaves no more than
+    maximum_voxels.  This is the level of a mipmap style pyramid that
+    would be reached by repeatedly halving the resolution, built in a
+    single pass without the finer levels.  Returns None if the volume
+    is already small enough.
+
+    If subsample is set every factor'th voxel is taken instead of the
+    mean of each block, so that only those slices and rows of a memory
+    mapped volume are read.
+    '''
+    shape = list(volume.shape)
+    factors = [1] * len(shape)
+    while np.prod([int(ceil(n / float(f))) for n, f in zip(shape, factors)]) > maximum_voxels:
+        coarser = [2 * f if n > f else f for n, f in zip(shape, factors)]
+        if coarser == factors:
+            break
+        factors = coarser
+
+    if factors == [1] * len(shape):
+        return None
+
+    if subsample:
+        fz, fy, fx = factors
+        return np.stack([np.asarray(volume[k])[::fy, ::fx] for k in range(0, shape[0], fz)])
+
+    return downsampleVolume(volume, factors)
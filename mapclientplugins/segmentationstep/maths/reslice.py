@@ -0,0 +1,147 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from math import ceil
+
+import numpy as np
+
+from mapclientplugins.segmentationstep.maths.vectorops import normalize, cross, dot, mult, sub
+
+'''
+Resample an image volume, stored as a numpy array indexed as
+(z, y, x) with the rows of each slice in file order, on an
+arbitrary plane.  The volume occupies the world coordinates
+pixel * scale + offset, the same as the image element, so the
+plane is given in world coordinates as a point and a normal.
+'''
+
+
+def calculatePlaneAxes(normal):
+    '''
+    Returns the unit [column, row] directions of the resliced image
+    in the plane with the given normal.  The columns follow the world
+    x axis projected onto the plane, or the y axis if the plane is
+    perpendicular to x, and the rows run down the image so that a
+    plane with normal [0, 0, 1] looks like the image files.
+    '''
+    n = normalize(normal)
+    reference = [1.0, 0.0, 0.0] if abs(n[0]) < 0.9 else [0.0, 1.0, 0.0]
+    column_axis = normalize(sub(reference, mult(n, dot(reference, n))))
+    row_axis = mult(cross(n, column_axis), -1)
+
+    return column_axis, row_axis
+
+
+def calculateResliceGrid(point, normal, shape, scale, offset, spacing=None):
+    '''
+    Returns the image shape (rows, columns) and the frame (origin,
+    column step, row step) in world coordinates of the grid on the
+    plane that covers the volume of the given (z, y, x) shape.  The
+    origin is the centre of the first pixel.  The spacing of the grid
+    defaults to the smallest component of the scale.
+    '''
+    if spacing is None:
+        spacing = min(scale)
+    column_axis, row_axis = calculatePlaneAxes(normal)
+    depth, height, width = shape
+    corners = np.array([[x, y, z] for x in [0, width] for y in [0, height] for z in [0, depth]], dtype=np.float64)
+    corners = corners * scale + offset - point
+    u = corners.dot(column_axis)
+    v = corners.dot(row_axis)
+    columns = max(1, int(ceil((u.max() - u.min()) / spacing)))
+    rows = max(1, int(ceil((v.max() - v.min()) / spacing)))
+    origin = np.asarray(point, dtype=np.float64) \
+        + np.asarray(column_axis) * (u.min() + 0.5 * spacing) \
+        + np.asarray(row_axis) * (v.min() + 0.5 * spacing)
+
+    return (rows, columns), (origin, np.asarray(column_axis) * spacing, np.asarray(row_axis) * spacing)
+
+
+def worldToVoxel(points, shape, scale, offset):
+    '''
+    Convert an (..., 3) array of world coordinates into continuous
+    (z, y, x) voxel indices of a volume of the given shape, where
+    integer indices are at voxel centres.
+    '''
+    pixels = (np.asarray(points, dtype=np.float64) - offset) / scale
+    z = pixels[..., 2] - 0.5
+    y = shape[1] - 0.5 - pixels[..., 1]
+    x = pixels[..., 0] - 0.5
+
+    return z, y, x
+
+
+def sampleTrilinear(volume, z, y, x, fill_value=0.0):
+    '''
+    Sample the volume at the continuous voxel indices with trilinear
+    interpolation.  Samples more than half a voxel outside of the
+    volume are set to the fill_value.  Returns a float32 array with
+    the shape of the indices.  The volume may be any array like object
+    with a shape and a numpy style take() of flat indices, the voxels
+    are gathered with a single call to take().
+    '''
+    strides = [volume.shape[1] * volume.shape[2], volume.shape[2], 1]
+    outside = np.zeros(np.shape(z), dtype=bool)
+    base_index = np.zeros(np.shape(z), dtype=np.intp)
+    steps = []
+    weights = []
+    for index, size, stride in zip([z, y, x], volume.shape, strides):
+        outside |= (index < -0.5) | (index > size - 0.5)
+        index = np.clip(index, 0.0, size - 1)
+        base = np.minimum(index.astype(np.intp), max(0, size - 2))
+        fraction = (index - base).astype(np.float32)
+        base_index += base * stride
+        steps.append(stride if size > 1 else 0)
+        weights.append((1.0 - fraction, fraction))
+
+    corners = [(i, j, k) for i in range(2) for j in range(2) for k in range(2)]
+    values = volume.take(np.stack([base_index + (i * steps[0] + j * steps[1] + k * steps[2]) for i, j, k in corners]))
+    result = np.zeros(np.shape(z), dtype=np.float32)
+    for corner_values, (i, j, k) in zip(values, corners):
+        result += corner_values * (weights[0][i] * weights[1][j] * weights[2][k])
+
+    result[outside] = fill_value
+
+    return result
+
+
+def resliceVolume(volume, point, normal, scale, offset, spacing=None, fill_value=0.0):
+    '''
+    Resample the volume on the plane through point with the given
+    normal, in world coordinates.  Returns the resliced image as a
+    float32 (rows, columns) array and its frame (origin, column step,
+    row step) in world coordinates, so that the centre of pixel
+    [r, c] is at origin + c * column_step + r * row_step.
+    '''
+    scale = np.asarray(scale, dtype=np.float64)
+    offset = np.asarray(offset, dtype=np.float64)
+    (rows, columns), frame = calculateResliceGrid(point, normal, volume.shape, scale, offset, spacing)
+    origin, column_step, row_step = frame
+    # The voxel indices are affine in the pixel indices, so only the
+    # origin and the two steps need converting.
+    origin_index = worldToVoxel(origin, volume.shape, scale, offset)
+    column_index = worldToVoxel(offset + column_step, volume.shape, scale, offset)
+    row_index = worldToVoxel(offset + row_step, volume.shape, scale, offset)
+    zero_index = worldToVoxel(offset, volume.shape, scale, offset)
+    r = np.arange(rows, dtype=np.float32)[:, np.newaxis]
+    c = np.arange(columns, dtype=np.float32)[np.newaxis, :]
+    z, y, x = [np.float32(o) + c * np.float32(ci - zi) + r * np.float32(ri - zi)
+               for o, ci, ri, zi in zip(origin_index, column_index, row_index, zero_index)]
+
+    return sampleTrilinear(volume, z, y, x, fill_value), frame
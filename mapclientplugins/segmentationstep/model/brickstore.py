@@ -0,0 +1,328 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import json
+import os
+import shutil
+import zlib
+from collections import OrderedDict
+from itertools import product
+from math import ceil
+from threading import Lock
+
+import numpy as np
+
+from mapclientplugins.segmentationstep.model.volumecache import fingerprintSource
+from mapclientplugins.segmentationstep.definitions import DEFAULT_BRICK_SIZE, DEFAULT_BRICK_CACHE_MB
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+'''
+Store an image volume as fixed size bricks that are compressed
+individually, so that reading part of the volume only decompresses
+the bricks it touches.  The bricks are compressed with lz4 when the
+optional lz4 package is installed, otherwise with zlib.
+'''
+
+BRICK_DIRECTORY_NAME = 'brick_cache'
+BRICK_HEADER_FILENAME = 'header.json'
+CODEC_ZLIB = 'zlib'
+CODEC_LZ4 = 'lz4'
+
+
+def _defaultCodec():
+    return CODEC_LZ4 if lz4_frame is not None else CODEC_ZLIB
+
+
+def _isCodecAvailable(codec):
+    return codec == CODEC_ZLIB or (codec == CODEC_LZ4 and lz4_frame is not None)
+
+
+def _compress(data, codec):
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(data)
+
+    return zlib.compress(data, 1)
+
+
+def _decompress(data, codec):
+    if codec == CODEC_LZ4:
+        return lz4_frame.decompress(data)
+
+    return zlib.decompress(data)
+
+
+def _brickFilename(brick_index):
+    return '%d_%d_%d.brick' % tuple(brick_index)
+
+
+class BrickStore(object):
+    '''
+    A persistent on disk cache of a decoded image volume with the same
+    interface as VolumeCache, the volume is stored as compressed bricks
+    in a directory below the given location.  A loaded volume is a
+    BrickVolume which keeps the most recently used bricks decompressed
+    up to the budget in bytes.  Only the most recently saved volume for
+    each image directory is kept.
+
+    The store saves disk space, not memory.  Reading part of the volume
+    only decompresses the bricks it touches, but anything that reads
+    the whole volume, such as the texture upload or thumbnails,
+    decompresses every brick and holds the whole volume.  The intensity
+    statistics read through the volume a slab of bricks at a time.
+    '''
+
+    def __init__(self, location, budget=DEFAULT_BRICK_CACHE_MB * 1024 * 1024, brick_size=DEFAULT_BRICK_SIZE):
+        self._directory = os.path.join(location, BRICK_DIRECTORY_NAME)
+        self._budget = budget
+        self._brick_size = brick_size
+        self._loaded = None
+
+    def _getDirectory(self, key, source):
+        return os.path.join(self._directory, fingerprintSource(source) + '_' + key)
+
+    def load(self, key, source):
+        '''
+        Returns the cached volume for the given key, loaded from the
+        source image directory, as a BrickVolume, or None if there is no
+        valid cached volume.  Loading the same volume again returns the
+        same BrickVolume so that the decompressed bricks are shared.
+        '''
+        directory = self._getDirectory(key, source)
+        if self._loaded is not None and self._loaded[0] == directory:
+            return self._loaded[1]
+
+        try:
+            with open(os.path.join(directory, BRICK_HEADER_FILENAME)) as f:
+                header = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if not _isCodecAvailable(header['codec']):
+            return None
+
+        volume = BrickVolume(directory, header['shape'], header['dtype'], header['brick_size'], header['codec'], self._budget)
+        self._loaded = (directory, volume)
+
+        return volume
+
+    def save(self, key, volume, source):
+        '''
+        Write the volume to the cache under the given key, replacing
+        any volume previously cached from the source image directory.
+        The volume is read one slab of bricks at a time.
+        '''
+        directory = self._getDirectory(key, source)
+        temporary_directory = directory + '.part'
+        codec = _defaultCodec()
+        size = self._brick_size
+        grid = [int(ceil(n / float(size))) for n in volume.shape]
+        try:
+            if os.path.exists(temporary_directory):
+                shutil.rmtree(temporary_directory)
+            os.makedirs(temporary_directory)
+            for bz in range(grid[0]):
+                slab = np.asarray(volume[bz * size:(bz + 1) * size])
+                for by, bx in product(range(grid[1]), range(grid[2])):
+                    brick = np.ascontiguousarray(slab[:, by * size:(by + 1) * size, bx * size:(bx + 1) * size])
+                    with open(os.path.join(temporary_directory, _brickFilename([bz, by, bx])), 'wb') as f:
+                        f.write(_compress(brick.tobytes(), codec))
+            header = {'shape': list(volume.shape), 'dtype': volume.dtype.str, 'brick_size': size, 'codec': codec}
+            with open(os.path.join(temporary_directory, BRICK_HEADER_FILENAME), 'w') as f:
+                json.dump(header, f)
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+            os.replace(temporary_directory, directory)
+            self._removeStale(key, source)
+        except (IOError, OSError):
+            pass
+
+    def _removeStale(self, key, source):
+        current = os.path.basename(self._getDirectory(key, source))
+        prefix = fingerprintSource(source) + '_'
+        for name in os.listdir(self._directory):
+            if name.startswith(prefix) and name != current:
+                shutil.rmtree(os.path.join(self._directory, name), ignore_errors=True)
+
+
+class BrickVolume(object):
+    '''
+    A read only (z, y, x) volume backed by the compressed bricks written
+    by a BrickStore.  It can be indexed and iterated like a numpy array,
+    each access decompresses only the bricks it needs and the most
+    recently used bricks are kept up to the budget in bytes, at least
+    one slab of bricks.  take() gathers voxels by flat index, as for
+    numpy arrays, and iterSlices() reads through the volume without
+    keeping the bricks.  Bricks may be read from a background thread.
+    '''
+
+    def __init__(self, directory, shape, dtype, brick_size, codec, budget):
+        self._directory = directory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+        self._brick_size = brick_size
+        self._codec = codec
+        self._grid = tuple(int(ceil(n / float(brick_size))) for n in self.shape)
+        brick_bytes = brick_size ** 3 * self.dtype.itemsize
+        self._capacity = max(self._grid[1] * self._grid[2], budget // brick_bytes)
+        self._bricks = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for index in range(self.shape[0]):
+            yield self[index]
+
+    def __array__(self, dtype=None, copy=None):
+        block = self._readBlock([0, 0, 0], self.shape)
+        return block if dtype is None else block.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (self.ndim - len(key))
+        indices = []
+        for axis_key, n in zip(key, self.shape):
+            if isinstance(axis_key, slice):
+                indices.append(np.arange(*axis_key.indices(n)))
+            else:
+                index = int(axis_key)
+                if index < 0:
+                    index += n
+                if not 0 <= index < n:
+                    raise IndexError('index %d is out of bounds for size %d' % (axis_key, n))
+                indices.append(np.intp(index))
+
+        if any(np.size(axis_indices) == 0 for axis_indices in indices):
+            return np.empty([len(i) for i in indices if np.ndim(i)], dtype=self.dtype)
+
+        start = [int(np.min(i)) for i in indices]
+        stop = [int(np.max(i)) + 1 for i in indices]
+        block = self._readBlock(start, stop)
+        for axis in reversed(range(self.ndim)):
+            block = np.take(block, indices[axis] - start[axis], axis=axis)
+
+        return block
+
+    def take(self, indices):
+        '''
+        Returns the voxels at the given flat indices into the volume,
+        with the shape of the indices.
+        '''
+        indices = np.asarray(indices)
+        flat_indices = indices.reshape(-1)
+        if self.size < 2 ** 31:
+            flat_indices = flat_indices.astype(np.int32)
+        zy, x = np.divmod(flat_indices, self.shape[2])
+        z, y = np.divmod(zy, self.shape[1])
+        (bz, z), (by, y), (bx, x) = self._splitIndex(z), self._splitIndex(y), self._splitIndex(x)
+        brick_ids = (bz * self._grid[1] + by) * self._grid[2] + bx
+        # Group the voxels by brick and gather each group straight from
+        # its decompressed brick.
+        order = np.argsort(brick_ids, kind='stable')
+        sorted_ids = brick_ids[order]
+        starts = np.flatnonzero(np.diff(sorted_ids, prepend=-1))
+        values = np.empty(len(flat_indices), dtype=self.dtype)
+        for start, stop in zip(starts, np.append(starts[1:], len(sorted_ids))):
+            group = order[start:stop]
+            brick = self._getBrick(np.unravel_index(sorted_ids[start], self._grid))
+            values[group] = brick[z[group], y[group], x[group]]
+
+        return values.reshape(indices.shape)
+
+    def iterSlices(self, step=1):
+        '''
+        Yields every step'th slice, decompressing each slab of bricks
+        once without adding them to the bricks kept for the views.
+        '''
+        size = self._brick_size
+        for first in range(0, self.shape[0], size):
+            stop = min(self.shape[0], first + size)
+            indices = range(first + (-first) % step, stop, step)
+            if len(indices) == 0:
+                continue
+            slab = self._readBlock([first, 0, 0], [stop, self.shape[1], self.shape[2]], keep=False)
+            for index in indices:
+                yield slab[index - first]
+
+    def _splitIndex(self, index):
+        '''
+        Returns the brick index and the index within the brick for the
+        voxel index, with shifts when the brick size is a power of two.
+        '''
+        size = self._brick_size
+        if size & (size - 1) == 0:
+            return np.right_shift(index, size.bit_length() - 1), np.bitwise_and(index, size - 1)
+
+        return np.divmod(index, size)
+
+    def getBrickCount(self):
+        '''
+        Returns the number of bricks currently decompressed.
+        '''
+        with self._lock:
+            return len(self._bricks)
+
+    def _readBlock(self, start, stop, keep=True):
+        block = np.empty([b - a for a, b in zip(start, stop)], dtype=self.dtype)
+        size = self._brick_size
+        ranges = [range(a // size, (b - 1) // size + 1) for a, b in zip(start, stop)]
+        for brick_index in product(*ranges):
+            brick = self._getBrick(brick_index, keep)
+            origin = [i * size for i in brick_index]
+            low = [max(a, o) for a, o in zip(start, origin)]
+            high = [min(b, o + n) for b, o, n in zip(stop, origin, brick.shape)]
+            block[tuple(slice(l - a, h - a) for l, h, a in zip(low, high, start))] = \
+                brick[tuple(slice(l - o, h - o) for l, h, o in zip(low, high, origin))]
+
+        return block
+
+    def _getBrick(self, brick_index, keep=True):
+        '''
+        Returns the decompressed brick, if keep is False a brick that is
+        not already kept is not added and the order is left unchanged.
+        '''
+        brick_index = tuple(int(i) for i in brick_index)
+        with self._lock:
+            if brick_index in self._bricks:
+                if keep:
+                    self._bricks.move_to_end(brick_index)
+                return self._bricks[brick_index]
+
+        size = self._brick_size
+        shape = [min(size, n - i * size) for i, n in zip(brick_index, self.shape)]
+        with open(os.path.join(self._directory, _brickFilename(brick_index)), 'rb') as f:
+            data = _decompress(f.read(), self._codec)
+        brick = np.frombuffer(data, dtype=self.dtype).reshape(shape)
+        if not keep:
+            return brick
+
+        with self._lock:
+            self._bricks[brick_index] = brick
+            while len(self._bricks) > self._capacity:
+                self._bricks.popitem(last=False)
+
+        return brick
@@ -0,0 +1,112 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import numpy as np
+
+from mapclientplugins.segmentationstep.definitions import DEFAULT_COORDINATE_STORE_CAPACITY
+
+
+class CoordinateStore(object):
+    '''
+    A copy of the coordinates of the nodes in a nodeset held in an
+    (N, 3) array, with an index from node identifier to row.  The rows
+    are kept packed, the row of a removed node is filled with the last
+    row.  The node model keeps the store in step with the nodeset so
+    that many locations can be read without evaluating Zinc fields.
+    '''
+
+    def __init__(self, capacity=DEFAULT_COORDINATE_STORE_CAPACITY):
+        self._coordinates = np.zeros((capacity, 3))
+        self._identifiers = np.zeros(capacity, dtype=np.int64)
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, node_id):
+        return node_id in self._rows
+
+    def clear(self):
+        self._rows = {}
+
+    def _reserve(self, count):
+        capacity = len(self._identifiers)
+        if count > capacity:
+            while capacity < count:
+                capacity *= 2
+            coordinates = np.zeros((capacity, 3))
+            identifiers = np.zeros(capacity, dtype=np.int64)
+            size = len(self._rows)
+            coordinates[:size] = self._coordinates[:size]
+            identifiers[:size] = self._identifiers[:size]
+            self._coordinates = coordinates
+            self._identifiers = identifiers
+
+    def add(self, node_id, location):
+        self.extend([node_id], [location])
+
+    def extend(self, node_ids, locations):
+        '''
+        Add the nodes with the given identifiers at the (N, 3)
+        locations, a node that is already in the store is moved.
+        '''
+        locations = np.asarray(locations, dtype=float).reshape(-1, 3)
+        new_node_ids = [node_id for node_id in node_ids if node_id not in self._rows]
+        size = len(self._rows)
+        self._reserve(size + len(new_node_ids))
+        for row, node_id in enumerate(new_node_ids, size):
+            self._rows[node_id] = row
+        self._identifiers[size:size + len(new_node_ids)] = new_node_ids
+        self._coordinates[self.getRows(node_ids)] = locations
+
+    def remove(self, node_id):
+        row = self._rows.pop(node_id, None)
+        if row is not None:
+            last = len(self._rows)
+            if row != last:
+                moved_node_id = int(self._identifiers[last])
+                self._identifiers[row] = moved_node_id
+                self._coordinates[row] = self._coordinates[last]
+                self._rows[moved_node_id] = row
+
+    def getRows(self, node_ids):
+        rows = self._rows
+        return np.fromiter((rows[node_id] for node_id in node_ids), dtype=np.intp, count=len(node_ids))
+
+    def getIdentifiers(self):
+        return self._identifiers[:len(self._rows)].copy()
+
+    def getLocation(self, node_id):
+        return self._coordinates[self._rows[node_id]].tolist()
+
+    def setLocation(self, node_id, location):
+        self._coordinates[self._rows[node_id]] = location
+
+    def getLocations(self, node_ids=None):
+        '''
+        Returns an (N, 3) array of the locations of the nodes, in the
+        order of the given identifiers or of the rows if there are none.
+        '''
+        if node_ids is None:
+            return self._coordinates[:len(self._rows)].copy()
+
+        return self._coordinates[self.getRows(node_ids)]
+
+    def setLocations(self, node_ids, locations):
+        self._coordinates[self.getRows(node_ids)] = np.asarray(locations, dtype=float).reshape(-1, 3)
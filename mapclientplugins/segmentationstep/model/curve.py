@@ -18,6 +18,7 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
     along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 '''
 import json
+import heapq
 
 from mapclientplugins.segmentationstep.maths.algorithms import paramerterizedSplines, \
     evaluatePolynomial
@@ -46,7 +47,10 @@ class CurveModel(object):
         return self._nodes
 
     def setNodes(self, node_ids):
+        curve_registry = self._node_model.getCurveRegistry()
+        curve_registry.removeNodes(self, self._nodes)
         self._nodes = node_ids
+        curve_registry.addNodes(self, self._nodes)
 
     def getInterpolationCount(self):
         return self._interpolation_count
@@ -55,9 +59,8 @@ class CurveModel(object):
         self._interpolation_count = count
 
     def calculate(self):
-        data = [self._node_model.getNodeLocation(self._node_model.getNodeByIdentifier(node_id)) for node_id in self._nodes]
-        if self.isClosed():
-            data += [self._node_model.getNodeLocation(self._node_model.getNodeByIdentifier(self._nodes[0]))]
+        node_ids = self._nodes + self._nodes[:1] if self.isClosed() else self._nodes
+        data = self._node_model.getNodeLocations(node_ids).tolist()
         splines = paramerterizedSplines(data)
         t = [float(i) / (self._interpolation_count + 1) for i in range(1, self._interpolation_count + 1)]
         locations = []
@@ -77,16 +80,19 @@ class CurveModel(object):
         # print(node_id, self._nodes)
         if node_id not in self._nodes:
             self._nodes.append(node_id)
+            self._node_model.getCurveRegistry().addNodes(self, [node_id])
         elif self.closes(node_id):
             self._closed = True
 
     def removeNode(self, node_id):
         if node_id in self._nodes:
                 index = self._nodes.index(node_id)
+                self._node_model.getCurveRegistry().removeNodes(self, self._nodes[index:])
                 del self._nodes[index:]
                 self._closed = False
 
     def removeAllNodes(self):
+        self._node_model.getCurveRegistry().removeNodes(self, self._nodes)
         self._nodes = []
         self._closed = False
 
@@ -110,3 +116,87 @@ class CurveModel(object):
         return key in self._nodes
 
 
+class CurveRegistry(object):
+    '''
+    The curves of a node model by identifier, with the identifier of
+    each curve and the identifier of the curve each node is on, so that
+    none of them need a search of the curves.  The curves tell the
+    registry when their nodes change.  Identifiers below the highest
+    one in use that are free are kept in a heap so the lowest unused
+    identifier is found directly.
+    '''
+
+    def __init__(self):
+        self._curves = {}
+        self._curve_identifiers = {}
+        self._node_curve_identifiers = {}
+        self._free_identifiers = []
+        self._identifier_limit = 0
+
+    def __iter__(self):
+        return iter(self._curves)
+
+    def __contains__(self, curve_identifier):
+        return curve_identifier in self._curves
+
+    def __getitem__(self, curve_identifier):
+        return self._curves[curve_identifier]
+
+    def keys(self):
+        return self._curves.keys()
+
+    def clear(self):
+        self.__init__()
+
+    def insert(self, curve_identifier, curve):
+        if curve_identifier in self._curves:
+            self.pop(curve_identifier)
+        for free_identifier in range(self._identifier_limit, curve_identifier):
+            heapq.heappush(self._free_identifiers, free_identifier)
+        self._identifier_limit = max(self._identifier_limit, curve_identifier + 1)
+        self._curves[curve_identifier] = curve
+        self._curve_identifiers[curve] = curve_identifier
+        self.addNodes(curve, curve.getNodes())
+
+    def pop(self, curve_identifier):
+        '''
+        Remove the curve with the given identifier from the registry and
+        return it, returns None if there is no such curve.
+        '''
+        curve = self._curves.pop(curve_identifier, None)
+        if curve is not None:
+            self.removeNodes(curve, curve.getNodes())
+            del self._curve_identifiers[curve]
+            heapq.heappush(self._free_identifiers, curve_identifier)
+
+        return curve
+
+    def getIdentifier(self, curve):
+        return self._curve_identifiers.get(curve)
+
+    def getNextIdentifier(self):
+        free_identifiers = self._free_identifiers
+        while free_identifiers and free_identifiers[0] in self._curves:
+            heapq.heappop(free_identifiers)
+
+        return free_identifiers[0] if free_identifiers else self._identifier_limit
+
+    def getCurveForNode(self, node_id):
+        curve_identifier = self._node_curve_identifiers.get(node_id)
+        if curve_identifier is None:
+            return None
+
+        return self._curves[curve_identifier]
+
+    def addNodes(self, curve, node_ids):
+        curve_identifier = self._curve_identifiers.get(curve)
+        if curve_identifier is not None:
+            for node_id in node_ids:
+                self._node_curve_identifiers[node_id] = curve_identifier
+
+    def removeNodes(self, curve, node_ids):
+        curve_identifier = self._curve_identifiers.get(curve)
+        if curve_identifier is not None:
+            for node_id in node_ids:
+                if self._node_curve_identifiers.get(node_id) == curve_identifier:
+                    del self._node_curve_identifiers[node_id]
@@ -0,0 +1,197 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pydicom
+except ImportError:
+    pydicom = None
+
+from mapclientplugins.segmentationstep.maths.vectorops import cross, dot
+from mapclientplugins.segmentationstep.misc import alphanum_key
+from mapclientplugins.segmentationstep.model.slicedecoder import isDicomFile
+from mapclientplugins.segmentationstep.model.volumecache import fingerprintFiles
+
+HEADER_CACHE_FILENAME = 'dicom_headers.json'
+
+LIST_TAGS = ['ImagePositionPatient', 'ImageOrientationPatient', 'PixelSpacing']
+INTEGER_TAGS = ['InstanceNumber', 'Rows', 'Columns']
+REAL_TAGS = ['SliceThickness']
+
+PROPERTY_TAGS = {
+    'dcm:PixelSpacing': 'PixelSpacing',
+    'dcm:SliceThickness': 'SliceThickness',
+    'dcm:ImagePosition(Patient)': 'ImagePositionPatient',
+}
+
+
+def isHeaderScanAvailable():
+    return pydicom is not None
+
+
+def readHeader(filename):
+    '''
+    Read the header of a DICOM image file without reading its pixel
+    data.  Only files with the DICOM preamble are parsed, forcing the
+    parse so that a missing file meta header is tolerated.  Returns a
+    dict of the header values used for ordering the slices, or None
+    if the file is not a DICOM image.  If the header of a file with
+    the preamble can not be read the dict only holds the filename, so
+    that the slices are ordered by filename.
+    '''
+    if not _hasDicomPreamble(filename):
+        return None
+
+    header = {'filename': os.path.basename(filename)}
+    try:
+        dataset = pydicom.dcmread(filename, stop_before_pixels=True, force=True,
+                                  specific_tags=LIST_TAGS + INTEGER_TAGS + REAL_TAGS)
+        if 'Rows' not in dataset or 'Columns' not in dataset:
+            return None
+
+        for tag in LIST_TAGS + INTEGER_TAGS + REAL_TAGS:
+            value = dataset.get(tag)
+            if value is None or value == '':
+                continue
+            if tag in LIST_TAGS:
+                header[tag] = [float(v) for v in value]
+            elif tag in INTEGER_TAGS:
+                header[tag] = int(value)
+            else:
+                header[tag] = float(value)
+    except Exception:
+        return {'filename': header['filename']}
+
+    return header
+
+
+def _hasDicomPreamble(filename):
+    try:
+        return isDicomFile(filename)
+    except IOError:
+        return False
+
+
+def sortHeaders(headers):
+    '''
+    Sort the headers by the position of the slice along the slice
+    normal if every slice has a position and orientation, otherwise
+    by instance number, otherwise by filename.
+    '''
+    if headers and all('ImagePositionPatient' in h and 'ImageOrientationPatient' in h for h in headers):
+        orientation = headers[0]['ImageOrientationPatient']
+        normal = cross(orientation[:3], orientation[3:])
+        key = lambda h: dot(h['ImagePositionPatient'], normal)
+    elif headers and all('InstanceNumber' in h for h in headers):
+        key = lambda h: h['InstanceNumber']
+    else:
+        key = lambda h: alphanum_key(h['filename'])
+
+    return sorted(headers, key=key)
+
+
+class DicomSeries(object):
+    '''
+    The headers of the DICOM images in a directory.
+    '''
+
+    def __init__(self, directory, headers):
+        self._directory = directory
+        self._headers = headers
+
+    def getFilenames(self):
+        return [os.path.join(self._directory, header['filename']) for header in self._headers]
+
+    def getProperty(self, name):
+        '''
+        Get the value of a property of the first slice formatted in the
+        same way as the Zinc image field property of the same name.
+        Returns None if the property is not available.
+        '''
+        tag = PROPERTY_TAGS.get(name)
+        if tag is None or tag not in self._headers[0]:
+            return None
+
+        value = self._headers[0][tag]
+        if isinstance(value, list):
+            return '\\'.join([str(v) for v in value])
+
+        return str(value)
+
+
+def _loadHeaderCache(location, key):
+    if location is None:
+        return None
+
+    try:
+        with open(os.path.join(location, HEADER_CACHE_FILENAME), 'r') as f:
+            d = json.load(f)
+    except (IOError, ValueError):
+        return None
+
+    if d.get('key') != key:
+        return None
+
+    return d['headers']
+
+
+def _saveHeaderCache(location, key, headers):
+    if location is None:
+        return
+
+    try:
+        if not os.path.exists(location):
+            os.makedirs(location)
+        with open(os.path.join(location, HEADER_CACHE_FILENAME), 'w') as f:
+            json.dump({'key': key, 'headers': headers}, f)
+    except IOError:
+        pass
+
+
+def scanDicomSeries(directory, filenames, location=None, key=None, threads=None, ordered=True):
+    '''
+    Read the headers of the given files in a pool of threads and drop
+    the files that are not DICOM images.  If ordered is set the rest
+    are ordered by slice position, otherwise they are kept in the
+    order given.  The headers are cached in the given location under
+    the given key, if no key is given one is made from the files
+    names, sizes and modification times.  Returns None if none of the
+    files are DICOM images.
+    '''
+    if pydicom is None or not filenames:
+        return None
+
+    if key is None:
+        key = fingerprintFiles(filenames)
+    headers = _loadHeaderCache(location, key)
+    if headers is None:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            headers = [header for header in executor.map(readHeader, filenames) if header is not None]
+        _saveHeaderCache(location, key, headers)
+
+    if not headers:
+        return None
+
+    if ordered:
+        headers = sortHeaders(headers)
+
+    return DicomSeries(directory, headers)
@@ -0,0 +1,98 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import json
+import os
+
+from mapclientplugins.segmentationstep.misc import alphanum_key
+
+INDEX_FILENAME = 'directory_index.json'
+IGNORED_FILENAMES = ['.hg', '.git', 'annotation.rdf']
+
+
+def _fingerprintDirectory(directory):
+    stat_result = os.stat(directory)
+    return [os.path.abspath(directory), stat_result.st_mtime_ns, len(os.listdir(directory))]
+
+
+def _scanDirectory(directory):
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name not in IGNORED_FILENAMES and entry.is_file():
+            stat_result = entry.stat()
+            entries.append([entry.name, stat_result.st_size, stat_result.st_mtime_ns])
+    entries.sort(key=lambda e: alphanum_key(e[0]))
+
+    return entries
+
+
+class DirectoryIndex(object):
+    '''
+    A persistent index of the files in an image directory.  The index
+    holds the ordered file names with their sizes and modification
+    times.  It is revalidated with the modification time of the
+    directory, which changes when files are added, removed or renamed,
+    and the number of entries in it, without a stat of each file.  The
+    files are only stat'ed again when either has changed.  A file that
+    is rewritten in place does not change the directory, so it is not
+    detected until the directory changes.
+    '''
+
+    def __init__(self, location=None):
+        self._location = location
+
+    def scan(self, directory):
+        '''
+        Returns a list of [name, size, mtime_ns] entries for the files
+        in the directory in alphanumeric order.
+        '''
+        fingerprint = _fingerprintDirectory(directory)
+        index = self._load()
+        if index is not None and index['fingerprint'] == fingerprint:
+            return index['entries']
+
+        entries = _scanDirectory(directory)
+        self._save({'fingerprint': fingerprint, 'entries': entries})
+
+        return entries
+
+    def _getFilename(self):
+        return os.path.join(self._location, INDEX_FILENAME)
+
+    def _load(self):
+        if self._location is None:
+            return None
+
+        try:
+            with open(self._getFilename(), 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _save(self, index):
+        if self._location is None:
+            return
+
+        try:
+            if not os.path.exists(self._location):
+                os.makedirs(self._location)
+            with open(self._getFilename(), 'w') as f:
+                json.dump(index, f)
+        except IOError:
+            pass
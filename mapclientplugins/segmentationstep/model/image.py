@@ -18,15 +18,42 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
     along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 '''
 import os
+import logging
+import weakref
+from functools import partial
+from math import ceil, floor, sqrt
+
+import numpy as np
 
 from cmlibs.utils.zinc.field import create_field_coordinates
 
 from mapclientplugins.segmentationstep.model.abstractmodel import AbstractModel
-from mapclientplugins.segmentationstep.maths.algorithms import calculateCentroid
-from mapclientplugins.segmentationstep.maths.vectorops import elmult
-from mapclientplugins.segmentationstep.plane import Plane
-from mapclientplugins.segmentationstep.zincutils import createFiniteElement
-from mapclientplugins.segmentationstep.misc import alphanum_key
+from mapclientplugins.segmentationstep.maths.algorithms import calculateCentroid, calculatePlaneAxisRange
+from mapclientplugins.segmentationstep.maths.vectorops import add, dot, eldiv, elmult, mult, sub
+from mapclientplugins.segmentationstep.plane import Plane, PlaneAttitude
+from mapclientplugins.segmentationstep.zincutils import createFiniteElement, setImageFieldPixels
+from mapclientplugins.segmentationstep.model.slicedecoder import decodeSlices, isDecoderAvailable, isDicomFile, \
+    readSliceSize
+from mapclientplugins.segmentationstep.model.volumecache import VolumeCache, fingerprintEntries
+from mapclientplugins.segmentationstep.model.brickstore import BrickStore
+from mapclientplugins.segmentationstep.model.directoryindex import DirectoryIndex
+from mapclientplugins.segmentationstep.model.sparsevolume import SparseVolume
+from mapclientplugins.segmentationstep.model.reslicecache import ResliceCache
+from mapclientplugins.segmentationstep.model.prefetcher import Prefetcher
+from mapclientplugins.segmentationstep.model.planeimage import PlaneImage
+from mapclientplugins.segmentationstep.model.previewcache import PreviewCache
+from mapclientplugins.segmentationstep.model.sharedvolumes import acquireSharedVolume, registerSharedVolume, \
+    releaseSharedVolume
+from mapclientplugins.segmentationstep.model.dicomheaders import isHeaderScanAvailable, scanDicomSeries
+from mapclientplugins.segmentationstep.maths.reslice import calculateResliceGrid, resliceVolume
+from mapclientplugins.segmentationstep.maths.imageops import buildCoarseLevel, downsampleVolume, calculateValueRange, \
+    quantizeVolume
+from mapclientplugins.segmentationstep.definitions import DEFAULT_MEMORY_BUDGET_MB, DEFAULT_SPARSE_SLICE_MARGIN, \
+    DEFAULT_INTERACTIVE_VOXEL_COUNT, DEFAULT_MAXIMUM_AUTOMATIC_DOWNSAMPLING, DEFAULT_ZINC_BYTES_PER_PIXEL, \
+    DEFAULT_PUSH_PULL_STEP_SIZE, DEFAULT_PREFETCH_STEPS, DEFAULT_AXIS_ALIGNED_TOLERANCE, DEFAULT_WINDOW_TOLERANCE, \
+    DEFAULT_TEXTURE_UPLOAD_COPIES, DEFAULT_INTERACTIVE_PIXEL_COUNT
+
+logger = logging.getLogger(__name__)
 
 
 class ImageModel(AbstractModel):
@@ -42,49 +69,244 @@ class ImageModel(AbstractModel):
         self._dimensions_px = [0, 0, 0]
 
         self._createImageRegion()
+        self._decode_in_parallel = False
+        self._cache_location = None
+        self._cache_images = False
+        self._compress_cache = False
+        self._volume_cache = None
+        self._files_key = None
+        self._image_directory = None
+        self._dicom_series = None
+        self._dicom_slice_order = False
+        self._sparse_loading = False
+        self._memory_budget = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024
+        self._downsample_factors = [1, 1, 1]
+        self._quantize_8bit = False
+        self._plane_texture_only = False
+        self._window = None
+        self._texture_window = None
+        self._applied_downsample_factors = [1, 1, 1]
+        self._volume = None
+        self._shared_volume_reference = None
+        self._reslice_cache = ResliceCache()
+        self._reslice_transform = None
+        self._prefetcher = None
+        self._push_pull_step_size = DEFAULT_PUSH_PULL_STEP_SIZE
+        self._volume_texture_uploaded = False
+        self._interactive_volume = None
+        self._interactive_image_field = None
+        self._sparse_volume = None
+        self._sparse_source_volume = None
+        self._slice_window = None
+        self._plane_interacting = False
+        self._image_files = None
+        self._texture_coordinate_field = None
         self._image_field = None
         self._material = None
+        self._plane_image = None
+        self._preview_cache = None
         self._plane = None
 
-    def loadImages(self, dataIn):
-        self._image_field = self._createImageField(dataIn)
-        self._dimensions_px = self._image_field.getSizeInPixels(3)[1]
+    def loadImages(self, dataIn, progress_callback=None, is_cancelled_method=None, message_callback=None):
+        '''
+        Read the images from the directory described by dataIn, this may
+        be called on a worker thread.  Images that Zinc reads itself are
+        read into the image field here, in this model's own Zinc
+        context which nothing else uses until initialize() is called on
+        the main thread.  The optional progress_callback is called as
+        progress_callback(index, count, filename) for each file decoded,
+        with an empty filename while Zinc reads the images, and finally
+        with index == count and an empty filename when all the files are
+        read.  The optional is_cancelled_method is polled between files,
+        a read by Zinc can not be interrupted and is discarded once it
+        finishes.  The optional message_callback is called with a
+        message for the user if the images are reduced to fit the
+        memory budget, or are over it.  Returns False if the load was
+        cancelled, True otherwise.
+        '''
+        return self._readImages(dataIn, progress_callback, is_cancelled_method, message_callback)
+
+    def setDecodeInParallel(self, state):
+        '''
+        When set, and a decoder is available, the slices are decoded
+        into memory in a pool of processes before being handed to Zinc.
+        Otherwise they are decoded on the loading thread if there is a
+        volume cache to write them to.
+        '''
+        self._decode_in_parallel = state
+
+    def setCacheLocation(self, location, compressed=False):
+        '''
+        Set the directory in which the directory index and the DICOM
+        headers are kept, and the decoded volume if caching the images
+        is set, see setCacheImages().  If compressed is set the volume
+        is cached as compressed bricks, see BrickStore, and only the
+        bricks that are needed are decompressed.
+        '''
+        self._cache_location = location if location else None
+        self._compress_cache = compressed
+        self._updateVolumeCache()
+
+    def setCacheImages(self, state):
+        '''
+        When set, and a decoder is available, the decoded volume is
+        cached in the cache location so that later loads of unchanged
+        images can memory map it instead of decoding the images again.
+        The mapped volume is still copied into the texture, so a load
+        from the cache saves the decode but not the copy.  The images
+        are decoded by Pillow or pydicom rather than by Zinc when they
+        are cached, and the cache takes as much disk space as the volume
+        takes in memory.  Off by default.
+        '''
+        self._cache_images = state
+        self._updateVolumeCache()
+
+    def _updateVolumeCache(self):
+        if self._cache_location is None or not self._cache_images:
+            self._volume_cache = None
+        elif self._compress_cache:
+            self._volume_cache = BrickStore(self._cache_location)
+        else:
+            self._volume_cache = VolumeCache(self._cache_location)
+
+    def setSparseLoading(self, state):
+        '''
+        When set, only the slices that the image plane passes through
+        are loaded into the texture.  The slices are paged in and out
+        as the plane moves, keeping within the memory budget.
+        '''
+        self._sparse_loading = state
+
+    def setMemoryBudget(self, budget_mb):
+        '''
+        Set the memory budget for the image volume.  If the volume is
+        estimated to be over the budget when it is loaded it is
+        downsampled, or if that would lose too much detail its slices
+        are loaded on demand.
+        '''
+        self._memory_budget = budget_mb * 1024 * 1024
+
+    def setDownsampleFactors(self, factors):
+        '''
+        Set the integer [x, y, z] factors by which the images are
+        downsampled when they are loaded.  The scale is multiplied by
+        the same factors so that the image keeps its physical size.
+        Only applies when the images are decoded or cached.
+        '''
+        self._downsample_factors = [max(1, int(f)) for f in factors]
+
+    def setQuantize8Bit(self, state):
+        '''
+        When set the image intensities are rescaled to 8 bits when the
+        images are loaded.  Only applies when the images are decoded or
+        cached.
+        '''
+        self._quantize_8bit = state
+
+    def setPlaneTextureOnly(self, state):
+        '''
+        When set the image volume is not passed to Zinc as a texture,
+        the image plane always shows the plane image which holds the
+        volume resliced on the CPU for the current plane.  Only applies
+        when the images are decoded or cached.
+        '''
+        self._plane_texture_only = state
+
+    def setDicomSliceOrder(self, state):
+        '''
+        When set, and pydicom is available, the DICOM slices are ordered
+        by their position instead of by file name.  Off by default as it
+        reorders the images of steps that already have points.
+        '''
+        self._dicom_slice_order = state
+
+    def setPushPullStepSize(self, step_size):
+        '''
+        Set the distance the image plane is pushed or pulled by the
+        tools, the images for the planes that distance away are
+        prefetched.
+        '''
+        self._push_pull_step_size = step_size
 
     def initialize(self):
+        self._image_field = self._createImageField()
+        if self._volume is not None:
+            depth, height, width = self._volume.shape
+            self._dimensions_px = [width, height, depth]
+        elif self._sparse_volume is not None:
+            depth, height, width = self._sparse_volume.getShape()
+            self._dimensions_px = [width, height, depth]
+        else:
+            self._dimensions_px = self._image_field.getSizeInPixels(3)[1]
+
         scale = [1.0, 1.0, 1.0]
         dicom_property = 'dcm:PixelSpacing'
-        px_spacing = self._image_field.getProperty(dicom_property)
+        px_spacing = self._getImageProperty(dicom_property)
         if px_spacing is not None:
             px_x, px_y = px_spacing.split('\\')
             scale[0] = float(px_x)
             scale[1] = float(px_y)
 
         dicom_property = 'dcm:SliceThickness'
-        slice_thickness = self._image_field.getProperty(dicom_property)
+        slice_thickness = self._getImageProperty(dicom_property)
         if slice_thickness is not None:
             scale[2] = float(slice_thickness)
 
         offset = [0.0, 0.0, 0.0]
         dicom_property = 'dcm:ImagePosition(Patient)'
-        patient_offset = self._image_field.getProperty(dicom_property)
+        patient_offset = self._getImageProperty(dicom_property)
         if patient_offset is not None:
             offset_x, offset_y, offset_z = patient_offset.split('\\')
             offset = [float(offset_x), float(offset_y), float(offset_z)]
             offset = [0.0, 0.0, 0.0]
 
+        # A downsampled pixel covers several of the original pixels.
+        scale = elmult(scale, self._applied_downsample_factors)
+
+        if self._plane_texture_only and self._volume is None:
+            logger.warning('Only uploading the image plane needs the images decoded into memory, uploading the '
+                           'image volume instead.')
+
         self._material = self._createMaterialUsingImageField(self._image_field)
         self._plane = self._createPlane()
         self._setupImageRegion()
+        if self._sparse_volume is not None:
+            self._updateTextureWindow()
+            self._plane.notifyChange.addObserver(self._planeChanged)
+        if self._sparse_volume is not None or self._interactive_image_field is not None \
+                or (self._plane_texture_only and self._volume is not None):
+            self._plane.notifyInteractionStart.addObserver(self._planeInteractionStarted)
+            self._plane.notifyInteractionEnd.addObserver(self._planeInteractionEnded)
+        if self._sparse_volume is not None or (self._plane_texture_only and self._volume is not None):
+            self._prefetcher = Prefetcher()
+            weakref.finalize(self, self._prefetcher.shutdown)
+            self._plane.notifyChange.addObserver(self._prefetchNeighbouringPlanes)
+        self._plane_image = PlaneImage(self._region, self._context.getMaterialmodule())
+        self._plane.notifyChange.addObserver(self._updatePlaneImage)
 
         self.setScale(scale)
         self.setOffset(offset)
 
+    def _getImageProperty(self, name):
+        '''
+        Get an image property from the DICOM header scan if there was
+        one, the decoded images are not read by Zinc so the image field
+        will not have the properties.
+        '''
+        if self._dicom_series is not None:
+            return self._dicom_series.getProperty(name)
+
+        return self._image_field.getProperty(name)
+
     def getPlane(self):
         return self._plane
 
     def getIsoScalarField(self):
         return self._iso_scalar_field
 
+    def getTextureCoordinateField(self):
+        return self._texture_coordinate_field
+
     def getDimensionsInPixels(self):
         return self._dimensions_px
 
@@ -104,6 +326,9 @@ class ImageModel(AbstractModel):
         fieldmodule.beginChange()
         self._offset_field.assignReal(fieldcache, offset)
         fieldmodule.endChange()
+        self._resliceTransformChanged()
+        if self._plane_image is not None:
+            self._updatePlaneImage()
 
     def getScale(self):
         fieldmodule = self._scale_field.getFieldmodule()
@@ -123,6 +348,7 @@ class ImageModel(AbstractModel):
         fieldmodule.beginChange()
         self._scale_field.assignReal(fieldcache, scale)
         fieldmodule.endChange()
+        self._resliceTransformChanged()
         # Do I also need to set the dimensions for the self._plane?
         # I'm going to go with yes.
         plane_centre = calculateCentroid(self._plane.getRotationPoint(), self._plane.getNormal(), elmult(self._dimensions_px, scale))
@@ -139,6 +365,377 @@ class ImageModel(AbstractModel):
     def getMaterial(self):
         return self._material
 
+    def getWindow(self):
+        return self._window
+
+    def setWindow(self, low, high, refine=False):
+        '''
+        Set the (low, high) intensity window that is stretched over the
+        range of the textures, usually from IntensityStatistics.  Zinc
+        holds the windowed pixels, so the textures of the volume have to
+        be read again to change the window.  If refine is set the window
+        will be refined by a later call and only the plane image, which
+        holds a single slice, is windowed now.  The texture of the whole
+        volume is only read again now if it is being drawn.  The window is only
+        changed if it has moved by more than DEFAULT_WINDOW_TOLERANCE of
+        its width.
+        '''
+        window = (low, high)
+        if _hasWindowMoved(self._window, window):
+            self._window = window
+            if self._plane_image is not None:
+                self._plane_image.setWindow(window)
+                self._updatePlaneImage()
+
+        if refine or not _hasWindowMoved(self._texture_window, self._window):
+            return
+
+        self._texture_window = self._window
+        if self._sparse_volume is not None:
+            self._loadSliceWindow(self._image_field, self._slice_window)
+        elif self._volume_texture_uploaded:
+            if self._plane_image is not None and self._plane_image.isActive():
+                # The volume texture is not drawn while the plane image is
+                # shown, upload it again when it is next drawn.
+                self._volume_texture_uploaded = False
+            else:
+                setImageFieldPixels(self._image_field, self._volume, self._window)
+        if self._interactive_image_field is not None:
+            setImageFieldPixels(self._interactive_image_field, self._interactive_volume, self._window)
+
+    def getStatisticsVolume(self):
+        '''
+        Get the volume to take the intensity statistics from, see
+        IntensityStatistics.  This is the volume from getVolume(), or
+        the slices loaded on demand if there is none, or None if the
+        images were read directly by Zinc.
+        '''
+        volume = self.getVolume()
+        if volume is None:
+            volume = self._sparse_volume
+
+        return volume
+
+    def getPreviewCache(self):
+        '''
+        Get the cache of slice thumbnails, see ThumbnailBuilder, or None
+        if there is no volume to build the thumbnails from.  The
+        thumbnails are built from getVolume(), so there are none when
+        the images were read by Zinc because neither Pillow nor pydicom
+        is installed, or when the slices are loaded on demand without a
+        full resolution cache.
+        '''
+        if self._preview_cache is None and self.getVolume() is not None:
+            self._preview_cache = PreviewCache(self._dimensions_px[2])
+
+        return self._preview_cache
+
+    def calculateSlicePlaneAttitude(self, index):
+        '''
+        Returns the plane attitude of the axial plane through the centre
+        of the slice with the given index, keeping the x and y of the
+        current rotation point.
+        '''
+        point = self._plane.getRotationPoint()
+        point[2] = (index + 0.5) * self.getScale()[2] + self.getOffset()[2]
+
+        return PlaneAttitude(point, [0.0, 0.0, 1.0])
+
+    def getPlaneImage(self):
+        '''
+        Get the plane image that shows the slice of the volume when the
+        image plane is aligned with an axis of the volume.
+        '''
+        return self._plane_image
+
+    def getVolume(self):
+        '''
+        Get the loaded image volume as a read-only (z, y, x) array
+        without decoding the images again.  The array shares the
+        decoded buffer or memory maps the volume cache, it is at the
+        resolution and bit depth of the texture block and the rows of
+        each slice are in file order.  If the cache is compressed the
+        volume is a BrickVolume, which reads like an array.  Returns
+        None if the images were read directly by Zinc, or are loaded on
+        demand and not cached at the texture resolution.
+        '''
+        volume = self._volume
+        if volume is None and self._sparse_volume is not None and not self._quantize_8bit \
+                and not any(f > 1 for f in self._applied_downsample_factors):
+            volume = self._sparse_source_volume
+        if volume is None:
+            return None
+
+        if isinstance(volume, np.ndarray):
+            volume = volume.view()
+            volume.flags.writeable = False
+
+        return volume
+
+    def getVoxelToWorldTransform(self):
+        '''
+        Get the 4x4 matrix that maps the homogeneous index [z, y, x, 1]
+        of a voxel of the volume from getVolume() to the homogeneous
+        world coordinates [x, y, z, 1] of the voxel centre, using the
+        current scale and offset.  The rows of the volume are in file
+        order which is the reverse of the image y axis.
+        '''
+        scale = self.getScale()
+        offset = self.getOffset()
+        height = self._dimensions_px[1]
+        transform = np.array([[0.0, 0.0, scale[0], 0.5 * scale[0] + offset[0]],
+                              [0.0, -scale[1], 0.0, (height - 0.5) * scale[1] + offset[1]],
+                              [scale[2], 0.0, 0.0, 0.5 * scale[2] + offset[2]],
+                              [0.0, 0.0, 0.0, 1.0]])
+
+        return transform
+
+    def getReslicedImage(self, plane_attitude=None, spacing=None):
+        '''
+        Resample the volume on the image plane, or on the given plane
+        attitude, without going through the graphics.  Returns the
+        float32 image and its frame in world coordinates, see
+        resliceVolume(), or None if there is no volume available.
+        Recently resliced images are kept in the reslice cache, the
+        cached images are read-only.
+        '''
+        if plane_attitude is None:
+            plane_attitude = self._plane.getAttitude()
+
+        resliced = self._reslice_cache.get(plane_attitude, spacing)
+        if resliced is not None:
+            return resliced
+
+        return self._resliceVolume(plane_attitude, spacing, self.getScale(), self.getOffset())
+
+    def getResliceCache(self):
+        return self._reslice_cache
+
+    def _resliceVolume(self, plane_attitude, spacing, scale, offset, cache=True):
+        '''
+        Reslice the volume and add the image to the reslice cache, if
+        cache is True, unless the scale or offset have changed in the
+        meantime.  This does not use Zinc so that it can be called from
+        the prefetcher.
+        '''
+        volume = self.getVolume()
+        if volume is None:
+            return None
+
+        resliced = resliceVolume(volume, plane_attitude.getPoint(), plane_attitude.getNormal(), scale, offset, spacing)
+        resliced[0].flags.writeable = False
+        if cache and self._reslice_transform == (tuple(scale), tuple(offset)):
+            self._reslice_cache.put(plane_attitude, spacing, resliced)
+
+        return resliced
+
+    def _resliceTransformChanged(self):
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+        self._reslice_transform = (tuple(self.getScale()), tuple(self.getOffset()))
+        self._reslice_cache.clear()
+
+    def _calculateNeighbouringPlanes(self):
+        '''
+        Returns the plane attitudes that are a push or pull of the image
+        plane away, at the step size set by the tools, up to
+        DEFAULT_PREFETCH_STEPS steps either side, nearest first.
+        '''
+        point = self._plane.getRotationPoint()
+        normal = self._plane.getNormal()
+        plane_attitudes = []
+        for step in range(1, DEFAULT_PREFETCH_STEPS + 1):
+            for direction in [1.0, -1.0]:
+                adjustment = mult(normal, direction * step * self._push_pull_step_size)
+                plane_attitudes.append(PlaneAttitude(add(point, adjustment), normal))
+
+        return plane_attitudes
+
+    def _prefetchNeighbouringPlanes(self):
+        '''
+        Prefetch, in the background, the images for the planes either
+        side of the image plane so that stepping the plane along its
+        normal does not wait on resampling or on reading slices.  Only
+        observed when the slices are loaded on demand or the plane image
+        is resliced, the prefetcher is shut down with the model.
+        '''
+        scale = self.getScale()
+        offset = self.getOffset()
+        if self._sparse_volume is not None:
+            prefetch = partial(self._pageInSlices, scale=scale, offset=offset)
+        elif self._plane_interacting:
+            # The planes are prefetched at full resolution when the drag
+            # ends, the plane is resliced coarsely while it is dragged.
+            return
+        else:
+            prefetch = partial(self._prefetchReslicedImage, scale=scale, offset=offset)
+
+        self._prefetcher.schedule([partial(prefetch, plane_attitude) for plane_attitude in self._calculateNeighbouringPlanes()])
+
+    def _prefetchReslicedImage(self, plane_attitude, scale, offset):
+        if not self._reslice_cache.contains(plane_attitude):
+            self._resliceVolume(plane_attitude, None, scale, offset)
+
+    def _pageInSlices(self, plane_attitude, scale, offset):
+        required_slices = self._calculateRequiredSlicesForPlane(plane_attitude.getPoint(), plane_attitude.getNormal(), scale, offset)
+        if required_slices is None:
+            return
+
+        for index in range(*required_slices):
+            if not self._sparse_volume.hasSlice(index):
+                self._sparse_volume.getSlice(index)
+
+    def _updatePlaneImage(self):
+        '''
+        Show the slice of the volume with the plane image when the image
+        plane is aligned with an axis of the volume, the slice is shown
+        as it is without resampling.  Otherwise the image plane is drawn
+        by contouring the image volume, or if only the plane texture is
+        uploaded the plane image shows the resliced volume.
+
+        The decoded volume is not uploaded as a texture until the plane
+        is first tilted, so a session that stays on axis aligned planes
+        never holds the volume on the graphics card.  When Zinc read the
+        images itself there is no volume to take the slices from and the
+        image plane is always drawn by contouring.
+        '''
+        if self._volume is None and self._sparse_volume is None:
+            return
+
+        scale = self.getScale()
+        offset = self.getOffset()
+        aligned = self._calculateAxisAlignedPlane(self._plane.getRotationPoint(), self._plane.getNormal(), scale, offset)
+        if aligned is not None:
+            axis, position = aligned
+            index = min(self._dimensions_px[axis] - 1, int(floor(position)))
+            if self._plane_image.getImageKey() != (axis, index):
+                image = self._extractAxisAlignedImage(axis, index)
+                if image is None:
+                    aligned = None
+                else:
+                    self._plane_image.setImage(image, (axis, index))
+
+        if aligned is not None:
+            u, v = [i for i in range(3) if i != axis]
+            corners = []
+            for corner in [[0, 0], [1, 0], [0, 1], [1, 1]]:
+                pixel = [position, position, position]
+                pixel[u] = corner[0] * self._dimensions_px[u]
+                pixel[v] = corner[1] * self._dimensions_px[v]
+                corners.append(add(elmult(pixel, scale), offset))
+            self._plane_image.setCorners(corners)
+        elif self._plane_texture_only and self._volume is not None:
+            aligned = self._showReslicedPlaneImage()
+        elif not (self._plane_interacting and self._interactive_image_field is not None):
+            self._uploadVolumeTexture()
+
+        self._plane_image.setActive(aligned is not None)
+
+    def _uploadVolumeTexture(self):
+        '''
+        Upload the decoded volume to the texture of the image field the
+        first time the image plane is drawn by contouring.
+        '''
+        if self._volume is None or self._plane_texture_only or self._volume_texture_uploaded:
+            return
+
+        setImageFieldPixels(self._image_field, self._volume, self._window)
+        self._texture_window = self._window
+        self._volume_texture_uploaded = True
+
+    def _showReslicedPlaneImage(self):
+        '''
+        Show the volume resliced on the image plane with the plane
+        image.  While the plane is being dragged the volume is resliced
+        with a coarser spacing, of at most DEFAULT_INTERACTIVE_PIXEL_COUNT
+        pixels, and at full resolution once the drag ends.  The coarse
+        images are not kept in the reslice cache as the plane rarely
+        comes back to the same attitude and spacing during a drag, they
+        would only push the full resolution images out.  Returns the
+        frame of the resliced image.
+        '''
+        spacing = None
+        if self._plane_interacting:
+            scale = self.getScale()
+            (rows, columns), _ = calculateResliceGrid(self._plane.getRotationPoint(), self._plane.getNormal(),
+                                                      self._volume.shape, scale, self.getOffset())
+            reduction = sqrt(rows * columns / float(DEFAULT_INTERACTIVE_PIXEL_COUNT))
+            if reduction > 1.0:
+                spacing = min(scale) * reduction
+        if spacing is None:
+            image, frame = self.getReslicedImage()
+        else:
+            image, frame = self._resliceVolume(self._plane.getAttitude(), spacing, scale, self.getOffset(), False)
+        origin, column_step, row_step = frame
+        rows, columns = image.shape
+        top_left = origin - 0.5 * column_step - 0.5 * row_step
+        bottom_left = top_left + rows * row_step
+        self._plane_image.setImage(np.rint(image).astype(self._volume.dtype))
+        self._plane_image.setCorners([bottom_left, bottom_left + columns * column_step,
+                                      top_left, top_left + columns * column_step])
+
+        return frame
+
+    def _calculateAxisAlignedPlane(self, point_on_plane, plane_normal, scale, offset):
+        '''
+        Returns the axis, 0, 1 or 2 for x, y or z, that the plane given
+        in world coordinates is perpendicular to, within
+        DEFAULT_AXIS_ALIGNED_TOLERANCE, and the pixel coordinate of the
+        plane along the axis.  Returns None if the plane is tilted or
+        does not pass through the image.
+        '''
+        length = sqrt(dot(plane_normal, plane_normal))
+        for axis in range(3):
+            if abs(plane_normal[axis]) >= (1.0 - DEFAULT_AXIS_ALIGNED_TOLERANCE) * length:
+                position = (point_on_plane[axis] - offset[axis]) / scale[axis]
+                if 0.0 <= position <= self._dimensions_px[axis]:
+                    return axis, position
+
+        return None
+
+    def _extractAxisAlignedImage(self, axis, index):
+        '''
+        Returns the slice of the volume perpendicular to the axis at the
+        given pixel index as an image with its top row first, x and y
+        increase to the right and z increases upwards.  Returns None if
+        the slice is not available without decoding the images.
+        '''
+        volume = self.getVolume()
+        if volume is None:
+            if axis == 2 and self._sparse_volume is not None:
+                return self._sparse_volume.getSlice(index)
+            return None
+
+        if axis == 2:
+            return volume[index]
+        elif axis == 1:
+            # The rows of the volume are in file order, the reverse of y.
+            return volume[::-1, self._dimensions_px[1] - 1 - index, :]
+
+        return volume[::-1, ::-1, index]
+
+    def _planeInteractionStarted(self):
+        '''
+        Show the coarse image while the plane is being dragged, and hold
+        off paging slices into the texture, and reslicing the plane at
+        full resolution, until the drag ends.
+        '''
+        self._plane_interacting = True
+        if self._interactive_image_field is not None:
+            self._material.setTextureField(1, self._interactive_image_field)
+
+    def _planeInteractionEnded(self):
+        self._plane_interacting = False
+        if self._interactive_image_field is not None:
+            if not self._plane_image.isActive():
+                self._uploadVolumeTexture()
+            self._material.setTextureField(1, self._image_field)
+        if self._sparse_volume is not None:
+            self._planeChanged()
+        elif self._plane_texture_only and self._volume is not None:
+            self._updatePlaneImage()
+            self._prefetchNeighbouringPlanes()
+
     def resizeElement(self, dimensions):
         node_coordinate_set = [[0, 0, 0], [dimensions[0], 0, 0], [0, dimensions[1], 0], [dimensions[0], dimensions[1], 0], [0, 0, dimensions[2]], [dimensions[0], 0, dimensions[2]], [0, dimensions[1], dimensions[2]], [dimensions[0], dimensions[1], dimensions[2]]]
         fieldmodule = self._region.getFieldmodule()
@@ -200,47 +797,440 @@ class ImageModel(AbstractModel):
 
         createFiniteElement(self._region, self._coordinate_field, self._dimensions_px)
 
+        # The texture may only hold a window of the slices, map the
+        # element xi onto the window.
+        xi_field = fieldmodule.findFieldByName('xi')
+        self._texture_scale_field = fieldmodule.createFieldConstant([1.0, 1.0, 1.0])
+        self._texture_offset_field = fieldmodule.createFieldConstant([0.0, 0.0, 0.0])
+        self._texture_coordinate_field = xi_field * self._texture_scale_field + self._texture_offset_field
+
         self._iso_scalar_field = _createIsoScalarField(fieldmodule, self._scaled_coordinate_field, normal_field, rotation_point_field)
         fieldmodule.endChange()
 
-    def _createImageField(self, dataIn):
+    def _listImageFiles(self, directory):
+        '''
+        Returns the absolute filenames of all the *files* in the given
+        directory in alphanumeric order, skipping version control
+        directories and annotation files.  The directory listing is
+        kept in a persistent index that is revalidated with a stat of
+        the directory and of each file.  If the directory holds DICOM images
+        their headers are scanned for the image properties, and if DICOM
+        slice ordering is set the files that are not DICOM images are
+        dropped and the rest are ordered by slice position.
+
+        Sets the class attribute '_files_key' from the names, sizes
+        and modification times of the files in the order they are
+        returned, so that volumes loaded in a different slice order are
+        cached and shared under different keys.
+        '''
+        self._image_directory = directory
+        entries = DirectoryIndex(self._cache_location).scan(directory)
+        self._files_key = fingerprintEntries(entries)
+        image_files = [os.path.join(directory, entry[0]) for entry in entries]
+
+        if isHeaderScanAvailable():
+            self._dicom_series = scanDicomSeries(directory, image_files, self._cache_location, self._files_key,
+                                                 ordered=self._dicom_slice_order)
+            if self._dicom_series is not None and self._dicom_slice_order:
+                image_files = self._dicom_series.getFilenames()
+                entry_map = dict((entry[0], entry) for entry in entries)
+                self._files_key = fingerprintEntries([entry_map[os.path.basename(f)] for f in image_files])
+
+        return image_files
+
+    def unloadImages(self):
+        '''
+        Release the loaded images, the slices paged in on demand and
+        the memory map of the volume cache that they are read from.
+        '''
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+        self._reslice_cache.clear()
+        self._volume = None
+        self._interactive_volume = None
+        self._sparse_volume = None
+        self._sparse_source_volume = None
+        self._image_field = None
+        if self._shared_volume_reference is not None:
+            self._shared_volume_reference()
+            self._shared_volume_reference = None
+
+    def _readImages(self, dataIn, progress_callback=None, is_cancelled_method=None, message_callback=None):
+        '''
+        Reads all the *files* in the given directory, assuming a) that
+        the directory exists and b) that there are image files in the
+        directory.  c) the image files are sufficiently named so that
+        Zinc can determine their format.
+
+        The images are decoded into a volume if they are cached or
+        decoded in parallel, and the first slices are paged in if they
+        are loaded on demand.  Otherwise Zinc reads the files into the
+        image field, see _readImageFieldWithZinc().
+
+        Returns False if the is_cancelled_method reports that the
+        load has been cancelled.
+        '''
+        image_files = self._listImageFiles(dataIn.location())
+        factors, sparse_loading = self._planMemoryBudget(image_files)
+        budget_mb = self._memory_budget // (1024 * 1024)
+        if sparse_loading and not self._sparse_loading:
+            _reportMemoryBudget('Loading the slices on demand to keep within the memory budget of %d MB.'
+                                % budget_mb, message_callback)
+        elif factors != self._downsample_factors:
+            _reportMemoryBudget('Downsampling the images by %d x %d x %d to keep within the memory budget of %d MB.'
+                                % (tuple(factors) + (budget_mb,)), message_callback)
+        if sparse_loading:
+            source_volume = self._loadCachedVolume()
+            if source_volume is not None or isDecoderAvailable():
+                self._sparse_source_volume = source_volume
+                self._sparse_volume = SparseVolume(image_files, self._memory_budget, source_volume,
+                                                   factors[::-1], self._quantize_8bit)
+                self._applied_downsample_factors = self._calculateAppliedDownsampling(image_files, factors,
+                                                                                      self._sparse_volume.getShape())
+                centre = self._sparse_volume.getShape()[0] / 2.0
+                self._slice_window = self._calculateSliceWindow(*self._calculateRequiredSlices(centre, centre, centre))
+                for index in range(*self._slice_window):
+                    self._sparse_volume.getSlice(index)
+
+                return True
+
+        volume = self._loadVolume(image_files, factors, progress_callback, is_cancelled_method)
+        if is_cancelled_method is not None and is_cancelled_method():
+            return False
+
+        if volume is not None:
+            if progress_callback is not None:
+                progress_callback(len(image_files), len(image_files), '')
+            self._volume = volume
+
+            return True
+
+        count = len(image_files)
+        if progress_callback is not None:
+            progress_callback(0, count, '')
+        self._image_files = image_files
+        image_field = self._readImageFieldWithZinc(image_files, message_callback)
+        if is_cancelled_method is not None and is_cancelled_method():
+            return False
+        if progress_callback is not None:
+            progress_callback(count, count, '')
+
+        self._image_field = image_field
+
+        return True
+
+    def _readImageFieldWithZinc(self, image_files, message_callback=None):
         '''
-        Creates an image field from all the *files* in the given 
-        directory, assuming a) that the directory exists and b)
-        that there are image files in the directory.  c) the image
-        files are sufficiently named so that Zinc can determine
-        their format.
-        
-        Sets the class attribute '_dimensions_px' from the image
-        data.
+        Read the image files into a new image field with Zinc.  Zinc
+        reads the files directly, so the contents of the files are not
+        held in memory alongside the image.
         '''
         fieldmodule = self._region.getFieldmodule()
+        self._checkMemoryBudgetWithZinc(fieldmodule, message_callback)
         image_field = fieldmodule.createFieldImage()
         image_field.setName('image_field')
         image_field.setFilterMode(image_field.FILTER_MODE_LINEAR)
-
-        # Create a stream information object that we can use to read the
-        # image file from disk
         stream_information = image_field.createStreaminformationImage()
-        # specify depth of texture block i.e. number of images
-#        stream_information.setAttributeInteger(stream_information.IMAGE_ATTRIBUTE_, self.number_of_images)
-
+        # DICOM files often have no file extension for Zinc to go by, so
+        # check for the DICOM magic.
+        if isDicomFile(image_files[0]):
+            stream_information.setFileFormat(stream_information.FILE_FORMAT_DICOM)
         # Load images onto an individual texture blocks.
-        directory = dataIn.location()
-        files = os.listdir(directory)
-        files.sort(key=alphanum_key)
-        for filename in files:
-            if filename not in ['.hg', '.git', 'annotation.rdf']:
-                # We are reading in a file from the local disk so our resource is a file.
-                absolute_filename = os.path.join(directory, filename)
-                if os.path.isfile(absolute_filename):
-                    stream_information.createStreamresourceFile(absolute_filename)
-
-        # Actually read in the image file into the image field.
+        for absolute_filename in image_files:
+            stream_information.createStreamresourceFile(absolute_filename)
+
+        # Actually read in the images into the image field.
         image_field.read(stream_information)
 
         return image_field
 
+    def _createImageField(self):
+        '''
+        Creates the image field from the images decoded by
+        _readImages(), this is done on the main thread.  Images that
+        Zinc reads itself were already read into the image field by
+        _readImages().
+        '''
+        if self._image_field is not None:
+            return self._image_field
+
+        fieldmodule = self._region.getFieldmodule()
+        image_field = fieldmodule.createFieldImage()
+        image_field.setName('image_field')
+        image_field.setFilterMode(image_field.FILTER_MODE_LINEAR)
+
+        if self._sparse_volume is not None:
+            self._loadSliceWindow(image_field, self._slice_window)
+        elif self._volume is not None:
+            # The volume is only uploaded once the image plane is tilted,
+            # see _uploadVolumeTexture().
+            if not self._plane_texture_only:
+                self._createInteractiveImageField(self._volume)
+
+        return image_field
+
+    def _createInteractiveImageField(self, volume):
+        '''
+        If the volume is too large to re-sample interactively, create an
+        image field of a coarse level of the volume to display while
+        the plane is being dragged.  Only that level is built and kept.
+        There is no volume to build it from when Zinc reads the images
+        itself, see _loadVolume(), so the full resolution image is
+        dragged then.
+        '''
+        # A volume mapped from the cache is subsampled rather than read
+        # in full to average it.
+        subsample = isinstance(volume, np.memmap) or not isinstance(volume, np.ndarray)
+        self._interactive_volume = buildCoarseLevel(volume, DEFAULT_INTERACTIVE_VOXEL_COUNT, subsample)
+        if self._interactive_volume is not None:
+            fieldmodule = self._region.getFieldmodule()
+            image_field = fieldmodule.createFieldImage()
+            image_field.setName('interactive_image_field')
+            image_field.setFilterMode(image_field.FILTER_MODE_LINEAR)
+            setImageFieldPixels(image_field, self._interactive_volume)
+            self._interactive_image_field = image_field
+
+    def _planMemoryBudget(self, image_files):
+        '''
+        Estimate the peak memory needed to load the image volume from
+        the image headers before any pixels are decoded.  The peak is
+        DEFAULT_TEXTURE_UPLOAD_COPIES copies of the volume while it is
+        uploaded to the texture, see setImageFieldPixels(), or a single
+        copy if only the plane texture is uploaded.  If that is over the memory budget choose
+        the smallest downsampling that brings it within the budget, or
+        load the slices on demand if that would need more than
+        DEFAULT_MAXIMUM_AUTOMATIC_DOWNSAMPLING.  Both need the images to
+        be decoded or cached.
+
+        Returns the [x, y, z] downsample factors and whether to load the
+        slices on demand, the configured options are not changed.  If
+        the images can not be decoded the configured options are
+        returned, the size is checked when Zinc reads the images, see
+        _checkMemoryBudgetWithZinc().
+        '''
+        if self._sparse_loading or not image_files:
+            return self._downsample_factors, self._sparse_loading
+
+        cached_volume = self._loadCachedVolume()
+        if cached_volume is not None:
+            depth, height, width = cached_volume.shape
+            bytes_per_pixel = cached_volume.dtype.itemsize
+        else:
+            slice_size = readSliceSize(image_files[0]) if isDecoderAvailable() else None
+            if slice_size is None:
+                return self._downsample_factors, False
+            depth = len(image_files)
+            width, height, bytes_per_pixel = slice_size
+        if self._quantize_8bit:
+            bytes_per_pixel = 1
+        copies = 1 if self._plane_texture_only else DEFAULT_TEXTURE_UPLOAD_COPIES
+
+        for level in range(1, DEFAULT_MAXIMUM_AUTOMATIC_DOWNSAMPLING + 1):
+            factors = [max(f, level) for f in self._downsample_factors]
+            dimensions = [int(ceil(n / float(f))) for n, f in zip([width, height, depth], factors)]
+            if dimensions[0] * dimensions[1] * dimensions[2] * bytes_per_pixel * copies <= self._memory_budget:
+                return factors, False
+
+        return self._downsample_factors, True
+
+    def _checkMemoryBudgetWithZinc(self, fieldmodule, message_callback=None):
+        '''
+        Images that Zinc reads itself can not be reduced to fit the
+        memory budget.  Read the size of the first image with Zinc and
+        report, before the images are read, if Zinc's copy of the volume
+        is estimated to be over the budget.
+        '''
+        width, height, bytes_per_pixel = _readSliceSizeWithZinc(fieldmodule, self._image_files[0])
+        estimate = width * height * len(self._image_files) * bytes_per_pixel
+        if estimate > self._memory_budget:
+            _reportMemoryBudget('Reading the images needs about %d MB, over the memory budget of %d MB.  Install '
+                                'Pillow or pydicom so that the images can be reduced to fit.'
+                                % (estimate // (1024 * 1024), self._memory_budget // (1024 * 1024)), message_callback)
+
+    def _loadVolume(self, image_files, factors, progress_callback=None, is_cancelled_method=None):
+        '''
+        Returns the decoded (z, y, x) volume for the image files, either
+        memory mapped from the volume cache or decoded, in parallel if
+        configured.  The images are decoded when there is a volume cache
+        even if they are not decoded in parallel, so that the cache can
+        be written, and when they are downsampled.  Returns None if
+        neither is possible, in which case the files are read directly
+        by Zinc, or if the load was cancelled.
+
+        The volume is downsampled by the [x, y, z] factors and quantized
+        as configured.  Only full resolution volumes are cached, so a
+        cached volume is downsampled after it is mapped while decoded
+        slices are downsampled as they arrive.
+
+        The loaded volume is shared with the other image models in the
+        process that load the same images in the same way, see
+        registerSharedVolume().  Only this volume is shared, each model
+        still uploads it to the texture of its own Zinc context.
+        '''
+        shared_volume_key = (self._files_key, tuple(factors), self._quantize_8bit)
+        volume = acquireSharedVolume(shared_volume_key)
+        if volume is not None:
+            logger.debug('Sharing the loaded %d MB image volume, the texture is not shared.',
+                         volume.size * volume.dtype.itemsize // (1024 * 1024))
+            self._holdSharedVolume(shared_volume_key)
+            self._applied_downsample_factors = self._calculateAppliedDownsampling(image_files, factors, volume.shape)
+            return volume
+
+        downsampled = any(f > 1 for f in factors)
+        volume = self._loadCachedVolume()
+        if volume is not None:
+            if downsampled:
+                volume = downsampleVolume(volume, factors[::-1])
+        elif (self._decode_in_parallel or self._volume_cache is not None or downsampled) and isDecoderAvailable():
+            volume = decodeSlices(image_files, processes=None if self._decode_in_parallel else 1,
+                                  progress_callback=progress_callback, is_cancelled_method=is_cancelled_method,
+                                  factors=factors[::-1])
+            if volume is not None and self._volume_cache is not None and not downsampled:
+                self._volume_cache.save(self._files_key, volume, self._image_directory)
+
+        if volume is None:
+            return None
+
+        self._applied_downsample_factors = self._calculateAppliedDownsampling(image_files, factors, volume.shape)
+        if self._quantize_8bit and volume.dtype != 'uint8':
+            volume = quantizeVolume(volume, calculateValueRange(volume))
+
+        volume = registerSharedVolume(shared_volume_key, volume)
+        self._holdSharedVolume(shared_volume_key)
+
+        return volume
+
+    def _calculateAppliedDownsampling(self, image_files, factors, shape):
+        '''
+        Returns the [x, y, z] factors by which the images were reduced to
+        the given (z, y, x) shape by downsampling with the [x, y, z]
+        factors.  The partial blocks at the far edges are padded when
+        they are downsampled, see downsampleVolume(), so for the image
+        to keep its extent a pixel covers n / ceil(n / f) of the n
+        original pixels rather than f.
+        '''
+        if not any(f > 1 for f in factors):
+            return [1, 1, 1]
+
+        source_volume = self._loadCachedVolume()
+        if source_volume is not None:
+            source_shape = source_volume.shape
+        else:
+            slice_size = readSliceSize(image_files[0])
+            if slice_size is None:
+                return factors
+            source_shape = (len(image_files), slice_size[1], slice_size[0])
+
+        return [n / float(m) for n, m in zip(source_shape[::-1], shape[::-1])]
+
+    def _holdSharedVolume(self, key):
+        '''
+        Keep a reference to the shared volume for as long as this model
+        exists, replacing any reference from an earlier load.
+        '''
+        if self._shared_volume_reference is not None:
+            self._shared_volume_reference()
+        self._shared_volume_reference = weakref.finalize(self, releaseSharedVolume, key)
+
+    def _loadCachedVolume(self):
+        if self._volume_cache is None:
+            return None
+
+        return self._volume_cache.load(self._files_key, self._image_directory)
+
+    def _calculateRequiredSlices(self, minimum, maximum, centre):
+        '''
+        Returns the range of slices [first, last) that cover the given
+        range of z pixel coordinates.  If there are more slices than
+        fit in the memory budget only those around the centre are
+        required.
+        '''
+        depth = self._sparse_volume.getShape()[0]
+        capacity = self._sparse_volume.getCapacity()
+        first = min(depth - 1, max(0, int(floor(minimum))))
+        last = max(first + 1, min(depth, int(ceil(maximum))))
+        if last - first > capacity:
+            half = max(1, capacity // 2 - DEFAULT_SPARSE_SLICE_MARGIN)
+            first = min(depth - 1, max(0, int(centre) - half))
+            last = max(first + 1, min(depth, int(centre) + half))
+
+        return first, last
+
+    def _calculateRequiredSlicesForPlane(self, point_on_plane, plane_normal, scale, offset):
+        '''
+        Returns the range of slices [first, last) required to show the
+        plane given in world coordinates, or None if the plane does not
+        pass through the image.
+        '''
+        point = eldiv(sub(point_on_plane, offset), scale)
+        normal = elmult(plane_normal, scale)
+        z_range = calculatePlaneAxisRange(point, normal, self._dimensions_px)
+        if z_range is None:
+            return None
+
+        return self._calculateRequiredSlices(z_range[0], z_range[1], point[2])
+
+    def _calculateSliceWindow(self, first, last):
+        '''
+        Returns the range of slices [start, stop) to hold in the texture
+        for the required slices [first, last), adding a margin either
+        side that is limited by the memory budget.
+        '''
+        depth = self._sparse_volume.getShape()[0]
+        capacity = self._sparse_volume.getCapacity()
+        start = max(0, first - DEFAULT_SPARSE_SLICE_MARGIN)
+        stop = min(depth, last + DEFAULT_SPARSE_SLICE_MARGIN)
+        if stop - start > capacity:
+            middle = (first + last) // 2
+            start = max(0, min(depth - capacity, middle - capacity // 2))
+            stop = start + capacity
+
+        return start, stop
+
+    def _loadSliceWindow(self, image_field, window):
+        start, stop = window
+        setImageFieldPixels(image_field, self._sparse_volume.getSlices(start, stop), self._window)
+        self._texture_window = self._window
+        self._slice_window = window
+        self._updateTextureWindow()
+
+    def _updateTextureWindow(self):
+        if self._texture_coordinate_field is None:
+            return
+
+        start, stop = self._slice_window
+        size = float(stop - start)
+        depth = self._sparse_volume.getShape()[0]
+        fieldmodule = self._texture_scale_field.getFieldmodule()
+        fieldcache = fieldmodule.createFieldcache()
+        fieldmodule.beginChange()
+        self._texture_scale_field.assignReal(fieldcache, [1.0, 1.0, depth / size])
+        self._texture_offset_field.assignReal(fieldcache, [0.0, 0.0, -start / size])
+        fieldmodule.endChange()
+
+    def _planeChanged(self):
+        '''
+        Page slices in and out of the texture when the plane has
+        moved outside of the slices currently held.  While the plane is
+        being dragged the texture is left as it is, the prefetcher
+        reads the slices in the background and the texture is updated
+        once when the drag ends.
+        '''
+        if self._plane_interacting:
+            return
+
+        required_slices = self._calculateRequiredSlicesForPlane(self._plane.getRotationPoint(), self._plane.getNormal(),
+                                                                self.getScale(), self.getOffset())
+        if required_slices is None:
+            return
+
+        first, last = required_slices
+        start, stop = self._slice_window
+        if start <= first and last <= stop:
+            return
+
+        self._loadSliceWindow(self._image_field, self._calculateSliceWindow(first, last))
+
     def _setImageTextureSize(self, size):
         '''
         Required if not using 'xi' for the texture coordinate field.
@@ -258,29 +1248,43 @@ class ImageModel(AbstractModel):
         materials_module = self._context.getMaterialmodule()
         material = materials_module.createMaterial()
 
-        spectrummodule = self._context.getSpectrummodule()
-        spectrum = spectrummodule.createSpectrum()
-        component = spectrum.createSpectrumcomponent()
-        component.setColourMappingType(component.COLOUR_MAPPING_TYPE_MONOCHROME)
-        component.setRangeMinimum(0)
-        component.setRangeMaximum(1)
-
-#         material.setSpectrum(spectrum)
-
-#         fieldmodule = image_field.getFieldmodule()
-#         histogram_field = fieldmodule.createFieldImagefilterHistogram(image_field)
-#         print histogram_field.getMarginalScale()
-#         print histogram_field.getNumberOfBins(10)
-#         print histogram_field.getComputeMinimumValues(10)
-#         print histogram_field.getComputeMaximumValues(10)
-#         rescaled_image_field = fieldmodule.createFieldImagefilterRescaleIntensity(image_field, 0, 1)
-#         actual_rescaled_image_field = fieldmodule.createFieldImageFromSource(rescaled_image_field)
+        # The intensity window is applied to the pixels of the image
+        # field when they are read, see setWindow().
         # Create an image field. A temporary xi source field is created for us.
         material.setTextureField(1, image_field)
 
         return material
 
 
+def _reportMemoryBudget(message, message_callback):
+    logger.warning(message)
+    if message_callback is not None:
+        message_callback(message)
+
+
+def _hasWindowMoved(previous, window):
+    if previous is None:
+        return True
+
+    tolerance = DEFAULT_WINDOW_TOLERANCE * (previous[1] - previous[0])
+    return abs(window[0] - previous[0]) > tolerance or abs(window[1] - previous[1]) > tolerance
+
+
+def _readSliceSizeWithZinc(fieldmodule, filename):
+    '''
+    Read a single image with Zinc to find its size.  Returns (width,
+    height, bytes per pixel), Zinc does not report the pixel depth
+    so DEFAULT_ZINC_BYTES_PER_PIXEL is assumed.
+    '''
+    image_field = fieldmodule.createFieldImage()
+    stream_information = image_field.createStreaminformationImage()
+    stream_information.createStreamresourceFile(filename)
+    image_field.read(stream_information)
+    width, height = image_field.getSizeInPixels(3)[1][:2]
+
+    return width, height, DEFAULT_ZINC_BYTES_PER_PIXEL
+
+
 def _createIsoScalarField(fieldmodule, finite_element_field, plane_normal_field, point_on_plane_field):
     d = fieldmodule.createFieldDotProduct(plane_normal_field, point_on_plane_field)
     iso_scalar_field = fieldmodule.createFieldDotProduct(finite_element_field, plane_normal_field) - d
@@ -0,0 +1,60 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from PySide6 import QtCore
+
+
+class ImageLoader(QtCore.QThread):
+    '''
+    Loads the images for a segmentation model on a worker thread so
+    that the GUI remains responsive.  Progress is reported for every
+    file and the load can be cancelled with requestInterruption().
+    messageChanged is emitted with any message for the user, such as
+    the images being reduced to fit the memory budget.
+    Zinc is not thread safe, the images are read into the model's own
+    Zinc context which is not used elsewhere until the model is
+    initialized on the main thread.
+    '''
+
+    progressChanged = QtCore.Signal(int, int, str)
+    messageChanged = QtCore.Signal(str)
+    loadFinished = QtCore.Signal()
+    loadCancelled = QtCore.Signal()
+    loadFailed = QtCore.Signal(str)
+
+    def __init__(self, model, dataIn, parent=None):
+        super(ImageLoader, self).__init__(parent)
+        self._model = model
+        self._dataIn = dataIn
+
+    def run(self):
+        try:
+            loaded = self._model.loadImages(self._dataIn, self._reportProgress, self.isInterruptionRequested,
+                                            self.messageChanged.emit)
+        except Exception as e:
+            self.loadFailed.emit(str(e))
+            return
+
+        if loaded:
+            self.loadFinished.emit()
+        else:
+            self.loadCancelled.emit()
+
+    def _reportProgress(self, index, count, filename):
+        self.progressChanged.emit(index, count, filename)
@@ -0,0 +1,71 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import numpy as np
+
+from PySide6 import QtCore
+
+from mapclientplugins.segmentationstep.maths.imageops import accumulateHistogram, calculateWindow
+from mapclientplugins.segmentationstep.definitions import DEFAULT_HISTOGRAM_STRIDES, DEFAULT_WINDOW_FRACTIONS
+
+
+class IntensityStatistics(QtCore.QThread):
+    '''
+    Computes the intensity histogram of an image volume on a worker
+    thread.  The histogram is first taken from a coarse subsample of
+    the voxels and then from finer ones until every voxel is counted,
+    windowChanged is emitted with the (low, high) intensity window
+    after each pass.  The volume may be an array, a BrickVolume or a
+    SparseVolume, the slices of the last two are read without going
+    through the bricks or slices kept for the views.  The computation
+    can be stopped with requestInterruption().
+    '''
+
+    windowChanged = QtCore.Signal(float, float)
+
+    def __init__(self, volume, strides=DEFAULT_HISTOGRAM_STRIDES, parent=None):
+        super(IntensityStatistics, self).__init__(parent)
+        self._volume = volume
+        self._strides = strides
+        self._histogram = None
+
+    def getHistogram(self):
+        '''
+        Returns the histogram from the last completed pass, or None.
+        '''
+        return self._histogram
+
+    def run(self):
+        for stride in self._strides:
+            histogram = None
+            for pixels in _iterSlices(self._volume, stride):
+                if self.isInterruptionRequested():
+                    return
+                histogram = accumulateHistogram(histogram, pixels[::stride, ::stride])
+
+            self._histogram = histogram
+            low, high = calculateWindow(histogram, DEFAULT_WINDOW_FRACTIONS)
+            self.windowChanged.emit(low, high)
+
+
+def _iterSlices(volume, step):
+    if isinstance(volume, np.ndarray):
+        return (volume[index] for index in range(0, volume.shape[0], step))
+
+    return volume.iterSlices(step)
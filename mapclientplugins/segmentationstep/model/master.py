@@ -38,8 +38,8 @@ class SegmentationModel(object):
         self._image_model = ImageModel(self._context)
         self._node_model = NodeModel(self._context)
 
-    def loadImages(self, dataIn):
-        self._image_model.loadImages(dataIn)
+    def loadImages(self, dataIn, progress_callback=None, is_cancelled_method=None, message_callback=None):
+        return self._image_model.loadImages(dataIn, progress_callback, is_cancelled_method, message_callback)
 
     def initialize(self):
         self._image_model.initialize()
@@ -52,6 +52,9 @@ class SegmentationModel(object):
     def getPointCloud(self):
         return self._node_model.getPointCloud()
 
+    def getPointCloudArray(self, with_kinds=False):
+        return self._node_model.getPointCloudArray(with_kinds)
+
     def getUndoRedoStack(self):
         return self._undo_redo_stack
 
@@ -19,13 +19,18 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
 '''
 import json
 
+import numpy as np
+
 from cmlibs.zinc.status import OK
 from cmlibs.utils.zinc.field import create_field_coordinates
 
+from mapclientplugins.segmentationstep.definitions import PointKind
 from mapclientplugins.segmentationstep.model.abstractmodel import AbstractModel
 from mapclientplugins.segmentationstep.segmentpoint import SegmentPointStatus
-from mapclientplugins.segmentationstep.model.curve import CurveModel
-from mapclientplugins.segmentationstep.plane import PlaneAttitude
+from mapclientplugins.segmentationstep.model.curve import CurveModel, CurveRegistry
+from mapclientplugins.segmentationstep.model.coordinatestore import CoordinateStore
+from mapclientplugins.segmentationstep.model.spatialindex import SpatialIndex
+from mapclientplugins.segmentationstep.plane import PlaneAttitude, PlaneAttitudeStore
 
 class NodeModel(AbstractModel):
 
@@ -33,10 +38,12 @@ class NodeModel(AbstractModel):
         super(NodeModel, self).__init__(context)
         self._attributes_that_auto_serialize = [ "_nodes", "_plane_attitudes"]
         self._plane = None
-        self._plane_attitude_store = []
+        self._plane_attitude_store = PlaneAttitudeStore()
         self._plane_attitudes = {}
         self._nodes = {}
-        self._curves = {}
+        self._curves = CurveRegistry()
+        self._node_coordinates = SpatialIndex()
+        self._datapoint_coordinates = CoordinateStore()
         self._on_plane_conditional_field = None
         self._on_plane_point_cloud_field = None
         self._on_plane_curve_field = None
@@ -53,34 +60,31 @@ class NodeModel(AbstractModel):
         self._on_plane_interpolation_point_field = self._createOnPlaneInterpolation()
 
     def getPointCloud(self):
-        cloud = []
-        node_nodeset = self._point_cloud_group.getMasterNodeset()
-        datapoint_nodeset = self._interpolation_point_group.getMasterNodeset()
-        def _getLocations(nodeset):
-            locations = []
-            ni = nodeset.createNodeiterator()
-            node = ni.next()
-            while node.isValid():
-                locations.append(self.getNodeLocation(node))
-                node = ni.next()
+        return self.getPointCloudArray().tolist()
+
+    def getPointCloudArray(self, with_kinds=False):
+        '''
+        Returns the locations of the segmentation points followed by
+        the interpolation points as a contiguous (N, 3) array.  If
+        with_kinds is True an array of the PointKind of each point is
+        returned as well.
+        '''
+        node_ids, node_locations = _getLocationsInIdentifierOrder(self._node_coordinates)
+        _, datapoint_locations = _getLocationsInIdentifierOrder(self._datapoint_coordinates)
+        cloud = np.concatenate((node_locations, datapoint_locations))
+        if not with_kinds:
+            return cloud
 
-            return locations
+        kinds = np.full(len(cloud), PointKind.INTERPOLATED, dtype=np.uint8)
+        kinds[:len(node_ids)] = np.where(np.isin(node_ids, _getNodeIdentifiers(self._curve_group)), PointKind.CURVE, PointKind.BASIC)
 
-        cloud += _getLocations(node_nodeset)
-        cloud += _getLocations(datapoint_nodeset)
-        return cloud
+        return cloud, kinds
 
     def _serializeNodeset(self, group):
-        str_rep = ''
-        ni = group.createNodeiterator()
-        node = ni.next()
-        while node.isValid():
-            str_rep += '"' + str(node.getIdentifier()) + '":' + json.dumps(self.getNodeLocation(node))
-            node = ni.next()
-            if node.isValid():
-                str_rep += ','
+        node_ids = _getNodeIdentifiers(group)
+        locations = self._node_coordinates.getLocations(node_ids).tolist()
 
-        return str_rep
+        return ','.join('"' + str(node_id) + '":' + json.dumps(location) for node_id, location in zip(node_ids, locations))
 
     def _serializeSelection(self):
         node_ids = []
@@ -106,10 +110,7 @@ class NodeModel(AbstractModel):
             str_rep += '"' + str(curve_index) + '":' + self._curves[curve_index].serialize() + ','
         str_rep = str_rep[:-1] + '},'
         str_rep += '"_plane_attitude_store":['
-        for plane_attitude in self._plane_attitude_store:
-            str_rep += plane_attitude.serialize()
-            if plane_attitude != self._plane_attitude_store[-1]:
-                str_rep += ', '
+        str_rep += ', '.join('null' if plane_attitude is None else plane_attitude.serialize() for plane_attitude in self._plane_attitude_store)
         str_rep += '],'
 
         for attr in self._attributes_that_auto_serialize:
@@ -121,9 +122,7 @@ class NodeModel(AbstractModel):
         return str_rep
 
     def _deserializeNodeset(self, group, data):
-        for node_id in data:
-            node = self._createNodeAtLocation(data[node_id], group.getName(), int(node_id))
-            group.addNode(node)
+        self._createNodesAtLocations(list(data.values()), [int(node_id) for node_id in data], group=group)
 
     def _deserializeSelection(self, data):
         for node_id in data:
@@ -137,6 +136,8 @@ class NodeModel(AbstractModel):
         master_nodeset.destroyAllNodes()
         master_nodeset = self._interpolation_point_group.getMasterNodeset()
         master_nodeset.destroyAllNodes()
+        self._node_coordinates.clear()
+        self._datapoint_coordinates.clear()
         self.setSelection([])
 
         d = json.loads(str_rep)
@@ -147,18 +148,20 @@ class NodeModel(AbstractModel):
         del d['_curve_points']
         self._plane.deserialize(json.dumps(d['_plane']))
         del d['_plane']
-        self._curves = {}
+        self._curves.clear()
         curves = d['_curves']
         for curve_index in curves:
             c = CurveModel(self)
             c.deserialize(json.dumps(curves[curve_index]))
             self.insertCurve(int(curve_index), c)
         del d['_curves']
-        self._plane_attitude_store = []
+        self._plane_attitude_store.clear()
         plane_attitude_store = d['_plane_attitude_store']
         for plane_attitude in plane_attitude_store:
-            p = PlaneAttitude(None, None)
-            p.deserialize(json.dumps(plane_attitude))
+            p = None
+            if plane_attitude is not None:
+                p = PlaneAttitude(None, None)
+                p.deserialize(json.dumps(plane_attitude))
             self._plane_attitude_store.append(p)
         del d['_plane_attitude_store']
         selection = d['_selection']
@@ -322,27 +325,26 @@ class NodeModel(AbstractModel):
         node_status = SegmentPointStatus(node_id, self.getNodeLocation(node), self.getNodePlaneAttitude(node_id))
         return node_status
 
+    def getNodeStatuses(self, node_ids):
+        locations = self.getNodeLocations(node_ids).tolist()
+        return [SegmentPointStatus(node_id, location, self.getNodePlaneAttitude(node_id)) for node_id, location in zip(node_ids, locations)]
+
     def _addId(self, plane_attitude, node_id):
-        if plane_attitude in self._plane_attitude_store:
-            index = self._plane_attitude_store.index(plane_attitude)
-            self._plane_attitudes[str(index)].append(node_id)
+        index = self._plane_attitude_store.find(plane_attitude)
+        if index is None:
+            index = self._plane_attitude_store.add(plane_attitude)
+            self._plane_attitudes[str(index)] = [node_id]
         else:
-            if None in self._plane_attitude_store:
-                index = self._plane_attitude_store.index(None)
-                self._plane_attitude_store[index] = plane_attitude
-            else:
-                index = len(self._plane_attitude_store)
-                self._plane_attitude_store.append(plane_attitude)
+            self._plane_attitudes[str(index)].append(node_id)
 
-            self._plane_attitudes[str(index)] = [node_id]
+        return index
 
-    def _removeId(self, plane_attitude, node_id):
-        plane_attitude_index = self._plane_attitude_store.index(plane_attitude)
-        index = self._plane_attitudes[str(plane_attitude_index)].index(node_id)
-        del self._plane_attitudes[str(plane_attitude_index)][index]
-        if len(self._plane_attitudes[str(plane_attitude_index)]) == 0:
+    def _removeId(self, plane_attitude_index, node_id):
+        node_ids = self._plane_attitudes[str(plane_attitude_index)]
+        node_ids.remove(node_id)
+        if len(node_ids) == 0:
             del self._plane_attitudes[str(plane_attitude_index)]
-            self._plane_attitude_store[plane_attitude_index] = None
+            self._plane_attitude_store.remove(plane_attitude_index)
 
     def getElementByIdentifier(self, element_id):
         fieldmodule = self._region.getFieldmodule()
@@ -351,20 +353,18 @@ class NodeModel(AbstractModel):
             element_id = -1
         return mesh.findElementByIdentifier(element_id)
 
-    def getNextCurveIdentifier(self):
-        next_identifier = 0
-        while next_identifier in self._curves:
-            next_identifier += 1
+    def getCurveRegistry(self):
+        return self._curves
 
-        return next_identifier
+    def getNextCurveIdentifier(self):
+        return self._curves.getNextIdentifier()
 
     def insertCurve(self, curve_identifier, curve):
-        self._curves[curve_identifier] = curve
+        self._curves.insert(curve_identifier, curve)
 
     def popCurve(self, curve_identifier):
-        if curve_identifier in self._curves:
-            curve = self._curves[curve_identifier]
-            del self._curves[curve_identifier]
+        curve = self._curves.pop(curve_identifier)
+        if curve is not None:
             node_ids = curve.getNodes()
             for node_id in node_ids:
                 self.removeNode(node_id)
@@ -374,29 +374,19 @@ class NodeModel(AbstractModel):
         return self._curves.keys()
 
     def getCurveIdentifier(self, curve):
-        for curve_identifier in self._curves:
-            if curve == self._curves[curve_identifier]:
-                return curve_identifier
-
-        return None
+        return self._curves.getIdentifier(curve)
 
     def getCurveWithIdentifier(self, index):
         return self._curves[index]
 
     def getCurveForNode(self, node_id):
-        for curve_identifier in self._curves:
-            curve = self._curves[curve_identifier]
-            if node_id in curve:
-                return curve
-
-        return None
+        return self._curves.getCurveForNode(node_id)
 
     def addNode(self, node_id, location, plane_attitude):
         if node_id == -1:
             node = self._createNodeAtLocation(location)
             node_id = node.getIdentifier()
-        self._addId(plane_attitude, node_id)
-        self._nodes[str(node_id)] = self._plane_attitude_store.index(plane_attitude)
+        self._nodes[str(node_id)] = self._addId(plane_attitude, node_id)
 
         return node_id
 
@@ -412,13 +402,12 @@ class NodeModel(AbstractModel):
         fieldmodule.endChange()
 
     def modifyNode(self, node_id, location, plane_attitude):
-        current_plane_attitude = self._plane_attitude_store[self._nodes[str(node_id)]]
+        current_index = self._nodes[str(node_id)]
         node = self.getNodeByIdentifier(node_id)
         self.setNodeLocation(node, location)
-        if current_plane_attitude != plane_attitude:
-            self._removeId(current_plane_attitude, node_id)
-            self._addId(plane_attitude, node_id)
-            self._nodes[str(node_id)] = self._plane_attitude_store.index(plane_attitude)
+        if self._plane_attitude_store[current_index] != plane_attitude:
+            self._removeId(current_index, node_id)
+            self._nodes[str(node_id)] = self._addId(plane_attitude, node_id)
 
     def setNodeLocation(self, node, location):
         fieldmodule = self._region.getFieldmodule()
@@ -427,8 +416,58 @@ class NodeModel(AbstractModel):
         fieldcache.setNode(node)
         self._coordinate_field.assignReal(fieldcache, location)
         fieldmodule.endChange()
+        self._getCoordinateStore(node.getNodeset()).add(node.getIdentifier(), location)
+
+    def setNodeLocations(self, node_ids, locations):
+        '''
+        Set the locations of the nodes with the given identifiers from
+        an (N, 3) array, Zinc is told of all the changes at once.
+        '''
+        locations = np.asarray(locations, dtype=float).reshape(-1, 3)
+        fieldmodule = self._region.getFieldmodule()
+        fieldcache = fieldmodule.createFieldcache()
+        nodeset = fieldmodule.findNodesetByName('nodes')
+        fieldmodule.beginChange()
+        for node_id, location in zip(node_ids, locations.tolist()):
+            fieldcache.setNode(nodeset.findNodeByIdentifier(node_id))
+            self._coordinate_field.assignReal(fieldcache, location)
+        fieldmodule.endChange()
+        self._node_coordinates.setLocations(node_ids, locations)
+
+    def getNodeLocations(self, node_ids):
+        '''
+        Returns an (N, 3) array of the locations of the nodes with the
+        given identifiers, read from the coordinate store.
+        '''
+        return self._node_coordinates.getLocations(node_ids)
+
+    def findNearestNodes(self, point, count=1):
+        '''
+        Returns the identifiers of the count nodes nearest to the point
+        and their distances from it, nearest first.
+        '''
+        return self._node_coordinates.findNearest(point, count)
+
+    def findNodesWithinRadius(self, point, radius):
+        '''
+        Returns the identifiers of the nodes within the radius of the
+        point and their distances from it, nearest first.
+        '''
+        return self._node_coordinates.findWithinRadius(point, radius)
+
+    def findNodesNearPlane(self, plane_attitude, distance):
+        '''
+        Returns the identifiers of the nodes within the distance of the
+        plane described by the plane attitude.
+        '''
+        return self._node_coordinates.findNearPlane(plane_attitude.getPoint(), plane_attitude.getNormal(), distance)
 
     def getNodeLocation(self, node):
+        coordinate_store = self._getCoordinateStore(node.getNodeset())
+        node_id = node.getIdentifier()
+        if node_id in coordinate_store:
+            return coordinate_store.getLocation(node_id)
+
         fieldmodule = self._region.getFieldmodule()
         fieldcache = fieldmodule.createFieldcache()
         fieldmodule.beginChange()
@@ -465,22 +504,23 @@ class NodeModel(AbstractModel):
 
     def removeNode(self, node_id):
         if str(node_id) in self._nodes:
-            plane_attitude = self._plane_attitude_store[self._nodes[str(node_id)]]
-            self._removeId(plane_attitude, node_id)
+            self._removeId(self._nodes[str(node_id)], node_id)
             del self._nodes[str(node_id)]
 
+        self._node_coordinates.remove(node_id)
         node = self.getNodeByIdentifier(node_id)
         nodeset = node.getNodeset()
         nodeset.destroyNode(node)
 
     def createNodes(self, node_statuses, group=None):
-        node_ids = []
-        for node_status in node_statuses:
-            node_id = self.addNode(-1, node_status.getLocation(), node_status.getPlaneAttitude())
-            if group is not None:
-                node = self.getNodeByIdentifier(node_id)
-                group.addNode(node)
-            node_ids.append(node_id)
+        fieldmodule = self._region.getFieldmodule()
+        fieldmodule.beginChange()
+
+        node_ids = self._createNodesAtLocations([node_status.getLocation() for node_status in node_statuses], group=group)
+        for node_id, node_status in zip(node_ids, node_statuses):
+            self.addNode(node_id, node_status.getLocation(), node_status.getPlaneAttitude())
+
+        fieldmodule.endChange()
 
         return node_ids
 
@@ -503,6 +543,7 @@ class NodeModel(AbstractModel):
         self._selection_group_field.clear()
 
         node = nodeset.createNode(-1, template)
+        self._node_coordinates.add(node.getIdentifier(), [0.0, 0.0, 0.0])
         self._group.addNode(node)
 
         fieldmodule.endChange()
@@ -514,24 +555,71 @@ class NodeModel(AbstractModel):
         Creates a node at the given location without
         adding it to the current selection.
         '''
+        node_id = self._createNodesAtLocations([location], [node_id], dataset)[0]
+        nodeset = self._region.getFieldmodule().findNodesetByName(dataset)
+
+        return nodeset.findNodeByIdentifier(node_id)
+
+    def _createNodesAtLocations(self, locations, node_ids=None, dataset='nodes', group=None):
+        '''
+        Creates nodes at the given locations, with the given identifiers
+        or the next free identifiers, in a single change.  The nodes are
+        added to the group if one is given.  Returns the identifiers of
+        the new nodes.
+        '''
+        if node_ids is None:
+            node_ids = [-1] * len(locations)
+
         fieldmodule = self._region.getFieldmodule()
         fieldmodule.beginChange()
 
         nodeset = fieldmodule.findNodesetByName(dataset)
         template = nodeset.createNodetemplate()
         template.defineField(self._coordinate_field)
-        node = nodeset.createNode(node_id, template)
-        self.setNodeLocation(node, location)
+        fieldcache = fieldmodule.createFieldcache()
+        created_node_ids = []
+        for node_id, location in zip(node_ids, locations):
+            node = nodeset.createNode(node_id, template)
+            fieldcache.setNode(node)
+            self._coordinate_field.assignReal(fieldcache, location)
+            if group is not None:
+                group.addNode(node)
+            created_node_ids.append(node.getIdentifier())
+
         fieldmodule.endChange()
+        self._getCoordinateStore(nodeset).extend(created_node_ids, locations)
 
-        return node
+        return created_node_ids
+
+    def _getCoordinateStore(self, nodeset):
+        if nodeset.getName() == 'datapoints':
+            return self._datapoint_coordinates
+
+        return self._node_coordinates
 
-    @staticmethod
-    def removeDatapoint(datapoint):
+    def removeDatapoint(self, datapoint):
+        self._datapoint_coordinates.remove(datapoint.getIdentifier())
         nodeset = datapoint.getNodeset()
         nodeset.destroyNode(datapoint)
 
 
+def _getNodeIdentifiers(nodeset):
+    node_ids = []
+    ni = nodeset.createNodeiterator()
+    node = ni.next()
+    while node.isValid():
+        node_ids.append(node.getIdentifier())
+        node = ni.next()
+
+    return node_ids
+
+
+def _getLocationsInIdentifierOrder(coordinate_store):
+    node_ids = coordinate_store.getIdentifiers()
+    order = np.argsort(node_ids, kind='stable')
+    return node_ids[order], coordinate_store.getLocations()[order]
+
+
 def _createPlaneEquationField(fieldmodule, coordinate_field, plane_normal_field, point_on_plane_field):
     d = fieldmodule.createFieldDotProduct(plane_normal_field, point_on_plane_field)
     plane_equation_field = fieldmodule.createFieldDotProduct(coordinate_field, plane_normal_field) - d
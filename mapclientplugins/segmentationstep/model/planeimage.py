@@ -0,0 +1,118 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import numpy as np
+
+from cmlibs.utils.zinc.field import create_field_coordinates
+from cmlibs.utils.zinc.finiteelement import create_square_element
+
+from mapclientplugins.segmentationstep.observed import event
+from mapclientplugins.segmentationstep.zincutils import setImageFieldPixels
+
+
+class PlaneImage(object):
+    '''
+    A single square element, in a child region of the image region,
+    textured with a two dimensional image that lies on the image plane.
+    Drawing the square is much cheaper than contouring the element of
+    the image volume and only the two dimensional image is held in the
+    texture.
+    '''
+
+    def __init__(self, parent_region, materialmodule):
+        self._region = parent_region.createChild('plane_image')
+        fieldmodule = self._region.getFieldmodule()
+        fieldmodule.beginChange()
+        self._coordinate_field = create_field_coordinates(fieldmodule, managed=True)
+        create_square_element(fieldmodule.findMeshByDimension(2), self._coordinate_field,
+                              [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]])
+        self._texture_coordinate_field = fieldmodule.findFieldByName('xi')
+        self._image_field = fieldmodule.createFieldImage()
+        self._image_field.setName('plane_image_field')
+        self._image_field.setFilterMode(self._image_field.FILTER_MODE_LINEAR)
+        fieldmodule.endChange()
+
+        self._material = materialmodule.createMaterial()
+        self._material.setTextureField(1, self._image_field)
+        self._active = False
+        self._image_key = None
+        self._window = None
+
+    @event
+    def notifyActiveChange(self):
+        '''
+        Using this as an event notification call, the plane image
+        has been switched on or off.
+        '''
+        pass
+
+    def getRegion(self):
+        return self._region
+
+    def getCoordinateField(self):
+        return self._coordinate_field
+
+    def getTextureCoordinateField(self):
+        return self._texture_coordinate_field
+
+    def getMaterial(self):
+        return self._material
+
+    def isActive(self):
+        return self._active
+
+    def setActive(self, state):
+        if self._active != state:
+            self._active = state
+            self.notifyActiveChange()
+
+    def setWindow(self, window):
+        '''
+        Set the (low, high) intensity window for the images that are
+        set from now on, the current image is marked as out of date.
+        '''
+        self._window = window
+        self._image_key = None
+
+    def getImageKey(self):
+        return self._image_key
+
+    def setImage(self, image, key=None):
+        '''
+        Set the (rows, columns) image to show, row 0 is drawn at the
+        top of the square.  The key identifies the image so that the
+        texture is only replaced when the image changes, see
+        getImageKey().
+        '''
+        setImageFieldPixels(self._image_field, np.asarray(image)[np.newaxis], self._window)
+        self._image_key = key
+
+    def setCorners(self, corners):
+        '''
+        Place the square using the world coordinates of its [bottom
+        left, bottom right, top left, top right] corners.
+        '''
+        fieldmodule = self._region.getFieldmodule()
+        fieldmodule.beginChange()
+        fieldcache = fieldmodule.createFieldcache()
+        nodeset = fieldmodule.findNodesetByName('nodes')
+        for node_id, corner in enumerate(corners, 1):
+            fieldcache.setNode(nodeset.findNodeByIdentifier(node_id))
+            self._coordinate_field.assignReal(fieldcache, list(corner))
+        fieldmodule.endChange()
@@ -0,0 +1,62 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+class Prefetcher(object):
+    '''
+    Runs prefetch tasks one after the other in a background thread.
+    Scheduling a new list of tasks supersedes the tasks that have not
+    been started yet, so only the prefetching for the most recent
+    request is done.
+    '''
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = Lock()
+        self._generation = 0
+
+    def schedule(self, tasks):
+        '''
+        Schedule the given callables, most important first.
+        '''
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self._executor.submit(self._run, generation, tasks)
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+
+    def _isCurrent(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def _run(self, generation, tasks):
+        for task in tasks:
+            if not self._isCurrent(generation):
+                return
+            task()
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,96 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from threading import Lock
+
+from PySide6 import QtCore
+
+from mapclientplugins.segmentationstep.maths.imageops import makeThumbnail
+from mapclientplugins.segmentationstep.definitions import DEFAULT_THUMBNAIL_SIZE
+
+
+def coarseToFineOrder(count):
+    '''
+    Returns the indices [0, count) ordered so that every stretch of the
+    range is visited early, first every largest power of two index then
+    the indices half way between those and so on.
+    '''
+    order = []
+    visited = set()
+    step = 1 << max(0, count.bit_length() - 1)
+    while step >= 1:
+        for index in range(0, count, step):
+            if index not in visited:
+                visited.add(index)
+                order.append(index)
+        step //= 2
+
+    return order
+
+
+class PreviewCache(object):
+    '''
+    Downsampled thumbnails of the axial slices of an image volume, a
+    thumbnail is None until it has been built.  The thumbnails may be
+    set from a background thread.
+    '''
+
+    def __init__(self, count):
+        self._thumbnails = [None] * count
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._thumbnails)
+
+    def getThumbnail(self, index):
+        with self._lock:
+            return self._thumbnails[index]
+
+    def hasThumbnail(self, index):
+        return self.getThumbnail(index) is not None
+
+    def setThumbnail(self, index, pixels):
+        with self._lock:
+            self._thumbnails[index] = pixels
+
+
+class ThumbnailBuilder(QtCore.QThread):
+    '''
+    Fills a preview cache with thumbnails of the slices of an image
+    volume on a worker thread, in coarse to fine order so that the
+    whole stack is covered quickly.  thumbnailReady is emitted with the
+    index of each thumbnail as it is built.  The build can be stopped
+    with requestInterruption().
+    '''
+
+    thumbnailReady = QtCore.Signal(int)
+
+    def __init__(self, volume, preview_cache, size=DEFAULT_THUMBNAIL_SIZE, parent=None):
+        super(ThumbnailBuilder, self).__init__(parent)
+        self._volume = volume
+        self._preview_cache = preview_cache
+        self._size = size
+
+    def run(self):
+        for index in coarseToFineOrder(len(self._preview_cache)):
+            if self.isInterruptionRequested():
+                return
+            if not self._preview_cache.hasThumbnail(index):
+                self._preview_cache.setThumbnail(index, makeThumbnail(self._volume[index], self._size))
+                self.thumbnailReady.emit(index)
@@ -0,0 +1,103 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from collections import OrderedDict
+from threading import Lock
+
+from mapclientplugins.segmentationstep.maths.vectorops import dot, normalize
+from mapclientplugins.segmentationstep.definitions import DEFAULT_RESLICE_CACHE_SIZE, DEFAULT_RESLICE_CACHE_DECIMALS
+
+
+def quantizeAttitude(plane_attitude, decimals=DEFAULT_RESLICE_CACHE_DECIMALS):
+    '''
+    Returns a hashable key for the plane of the plane attitude, the
+    unit normal and the distance of the plane from the origin along
+    the normal rounded to the given number of decimal places.  Points
+    anywhere on the same plane share a key, as do attitudes that differ
+    only by rounding error.  The resliced image only depends on the
+    plane, see calculateResliceGrid().
+    '''
+    normal = normalize(plane_attitude.getNormal())
+    distance = dot(normal, plane_attitude.getPoint())
+
+    return tuple(round(v, decimals) + 0.0 for v in normal) + (round(distance, decimals) + 0.0,)
+
+
+class ResliceCache(object):
+    '''
+    A bounded cache of resliced images keyed on the quantized plane
+    attitude, the least recently used image is dropped when the cache
+    is full.  Counts the hits and misses.  The cache may be filled
+    from a background thread.
+    '''
+
+    def __init__(self, capacity=DEFAULT_RESLICE_CACHE_SIZE):
+        self._capacity = capacity
+        self._images = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, plane_attitude, spacing=None):
+        '''
+        Returns the cached image for the plane attitude and spacing, or
+        None if it is not in the cache.
+        '''
+        key = (quantizeAttitude(plane_attitude), spacing)
+        with self._lock:
+            if key in self._images:
+                self._hits += 1
+                self._images.move_to_end(key)
+                return self._images[key]
+
+            self._misses += 1
+
+        return None
+
+    def contains(self, plane_attitude, spacing=None):
+        '''
+        Returns True if the image for the plane attitude and spacing is
+        in the cache, without counting a hit or a miss.
+        '''
+        with self._lock:
+            return (quantizeAttitude(plane_attitude), spacing) in self._images
+
+    def put(self, plane_attitude, spacing, image):
+        key = (quantizeAttitude(plane_attitude), spacing)
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self._capacity:
+                self._images.popitem(last=False)
+
+    def clear(self):
+        '''
+        Drop all the cached images, the counters are kept.
+        '''
+        with self._lock:
+            self._images.clear()
+
+    def getHits(self):
+        return self._hits
+
+    def getMisses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._images)
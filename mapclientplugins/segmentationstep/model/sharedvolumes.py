@@ -0,0 +1,83 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+
+'''
+A process wide registry of loaded image volumes so that the steps
+that load the same images share one copy.  Volumes are registered
+under a key built from the fingerprint of the image files and how the
+volume was reduced, and are reference counted, a volume is dropped
+from the registry when its last reference is released.  Shared
+volumes are read only.
+
+Only the decoded or cached volume is shared.  Each step has its own
+Zinc context, so the texture and the coarse level built from the
+volume are still held once per step, and images that Zinc reads
+itself are not shared at all.
+'''
+
+from threading import Lock
+
+import numpy as np
+
+_lock = Lock()
+_volumes = {}
+
+
+def acquireSharedVolume(key):
+    '''
+    Returns the volume registered under the key and adds a reference
+    to it, or None if there is no such volume.
+    '''
+    with _lock:
+        entry = _volumes.get(key)
+        if entry is None:
+            return None
+        entry[1] += 1
+        return entry[0]
+
+
+def registerSharedVolume(key, volume):
+    '''
+    Register the volume under the key with one reference.  If another
+    volume was registered under the key in the meantime that volume is
+    returned with a reference added instead, so that there is only
+    ever one copy.
+    '''
+    with _lock:
+        entry = _volumes.get(key)
+        if entry is None:
+            if isinstance(volume, np.ndarray):
+                volume.flags.writeable = False
+            entry = _volumes[key] = [volume, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def releaseSharedVolume(key):
+    '''
+    Release a reference to the volume registered under the key.
+    '''
+    with _lock:
+        entry = _volumes.get(key)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del _volumes[key]
+
@@ -0,0 +1,206 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+
+import numpy as np
+
+from mapclientplugins.segmentationstep.maths.imageops import downsampleVolume
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pydicom
+except ImportError:
+    pydicom = None
+
+'''
+Decode image slices into luminance pixel buffers in a pool of
+processes.  Decoding relies on the optional Pillow and pydicom
+packages, use isDecoderAvailable() to check that at least one of
+them is installed.
+'''
+
+DICOM_PREAMBLE_LENGTH = 128
+DICOM_MAGIC = b'DICM'
+
+
+def isDecoderAvailable():
+    return Image is not None or pydicom is not None
+
+
+def isDicomFile(filename):
+    with open(filename, 'rb') as f:
+        f.seek(DICOM_PREAMBLE_LENGTH)
+        return f.read(len(DICOM_MAGIC)) == DICOM_MAGIC
+
+
+def _toUnsigned(pixels):
+    '''
+    Zinc only accepts unsigned 8 or 16 bit components, shift signed
+    data into the unsigned range.  DICOM images are brought within 16
+    bits by _applyRescale(), wider data only comes from Pillow's 32 bit
+    'I' mode, which holds unsigned 16 bit images, so it is clipped.
+    '''
+    if pixels.dtype == np.uint8 or pixels.dtype == np.uint16:
+        return pixels
+    if pixels.dtype == np.int8:
+        return (pixels.astype(np.int16) + 128).astype(np.uint8)
+    if pixels.dtype == np.int16:
+        return (pixels.astype(np.int32) + 32768).astype(np.uint16)
+
+    return np.clip(pixels, 0, 65535).astype(np.uint16)
+
+
+def _applyRescale(dataset, pixels):
+    '''
+    Apply the DICOM RescaleSlope and RescaleIntercept to the stored
+    pixel values so that the intensities match the ones Zinc reads.
+    The rescaled values are kept as integers in the narrowest type that
+    holds the rescaled range of the stored bits, so that every slice of
+    a series is converted in the same way.  If the range is wider than
+    16 bits it is shifted to start at zero and, if it is still too
+    wide, scaled down to fit.
+    '''
+    slope = float(dataset.get('RescaleSlope', 1.0))
+    intercept = float(dataset.get('RescaleIntercept', 0.0))
+    if slope == 1.0 and intercept == 0.0 and pixels.dtype.itemsize <= 2:
+        return pixels
+
+    bits = int(dataset.get('BitsStored', 8 * pixels.dtype.itemsize))
+    if int(dataset.get('PixelRepresentation', 0)):
+        stored_range = [-2 ** (bits - 1), 2 ** (bits - 1) - 1]
+    else:
+        stored_range = [0, 2 ** bits - 1]
+    rescaled_range = sorted([slope * value + intercept for value in stored_range])
+    for dtype in [np.uint8, np.uint16, np.int16]:
+        info = np.iinfo(dtype)
+        if info.min <= rescaled_range[0] and rescaled_range[1] <= info.max:
+            return np.rint(pixels * slope + intercept).astype(dtype)
+
+    low, high = rescaled_range
+    scale = min(1.0, 65535.0 / (high - low))
+    return np.rint((pixels * slope + intercept - low) * scale).astype(np.uint16)
+
+
+def readSliceSize(filename):
+    '''
+    Read the size of an image from its header without decoding its
+    pixels.  Returns (width, height, bytes per pixel) of the slice as
+    decodeSlice() would return it, or None if the size cannot be read.
+    '''
+    try:
+        if pydicom is not None and isDicomFile(filename):
+            dataset = pydicom.dcmread(filename, stop_before_pixels=True,
+                                      specific_tags=['Rows', 'Columns', 'BitsAllocated'])
+            bits = int(dataset.get('BitsAllocated', 16))
+            return int(dataset.Columns), int(dataset.Rows), 1 if bits <= 8 else 2
+        if Image is not None:
+            with Image.open(filename) as image:
+                width, height = image.size
+                return width, height, 2 if image.mode in ['I;16', 'I;16B', 'I;16L', 'I'] else 1
+    except (IOError, ValueError, AttributeError):
+        pass
+
+    return None
+
+
+def decodeSlice(filename):
+    '''
+    Decode a single image file into a two dimensional array of
+    unsigned luminance values with the rows in file order.  Colour
+    images are converted to luminance.
+    '''
+    if pydicom is not None and isDicomFile(filename):
+        dataset = pydicom.dcmread(filename)
+        pixels = dataset.pixel_array
+        if pixels.ndim == 3:
+            pixels = pixels[..., 0]
+        pixels = _applyRescale(dataset, pixels)
+    elif Image is not None:
+        with Image.open(filename) as image:
+            if image.mode not in ['L', 'I;16', 'I;16B', 'I;16L', 'I']:
+                image = image.convert('L')
+            pixels = np.asarray(image)
+    else:
+        raise RuntimeError('No decoder is available for: ' + filename)
+
+    return _toUnsigned(pixels)
+
+
+def decodeSlices(filenames, processes=None, progress_callback=None, is_cancelled_method=None, factors=None):
+    '''
+    Decode the given files in a pool of processes and return a
+    volume array indexed as (z, y, x) with the slices in the same
+    order as the filenames.  The optional progress_callback is called
+    as progress_callback(index, count, filename) as each slice
+    arrives and is_cancelled_method is polled between slices.
+    Returns None if the decode was cancelled.
+
+    The processes are spawned rather than forked, the caller may be a
+    thread of a multithreaded Qt application which is not safe to fork.
+    Spawning a process costs more than decoding a slice, the pool only
+    pays for itself on larger stacks.  With a single process the slices
+    are decoded in the calling thread instead.
+
+    If integer (z, y, x) factors are given the volume is downsampled
+    as the slices arrive, so the full resolution volume is never held
+    in memory.
+    '''
+    count = len(filenames)
+    fz, fy, fx = [1, 1, 1] if factors is None else [max(1, int(f)) for f in factors]
+    depth = int(ceil(count / float(fz)))
+    volume = None
+    group = []
+    workers = processes if processes else (os.cpu_count() or 1)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        decoded_slices = executor.map(decodeSlice, filenames, chunksize=max(1, count // (4 * workers)))
+    else:
+        decoded_slices = map(decodeSlice, filenames)
+    try:
+        for index, pixels in enumerate(decoded_slices):
+            if is_cancelled_method is not None and is_cancelled_method():
+                return None
+            if fy > 1 or fx > 1:
+                pixels = downsampleVolume(pixels[np.newaxis], [1, fy, fx])[0]
+            if volume is None:
+                volume = np.empty((depth,) + pixels.shape, dtype=pixels.dtype)
+            elif pixels.shape != volume.shape[1:]:
+                raise ValueError('Image size of ' + filenames[index] + ' does not match the first image.')
+            elif pixels.dtype.itemsize > volume.dtype.itemsize:
+                volume = volume.astype(pixels.dtype)
+            group.append(pixels.astype(volume.dtype, copy=False))
+            if len(group) == fz or index == count - 1:
+                volume[index // fz] = group[0] if len(group) == 1 else downsampleVolume(np.stack(group), [len(group), 1, 1])[0]
+                group = []
+            if progress_callback is not None:
+                progress_callback(index, count, filenames[index])
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return volume
@@ -0,0 +1,140 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from collections import OrderedDict
+from math import ceil
+from threading import Lock
+
+import numpy as np
+
+from mapclientplugins.segmentationstep.model.slicedecoder import decodeSlice
+from mapclientplugins.segmentationstep.maths.imageops import downsampleVolume, calculateValueRange, quantizeVolume
+from mapclientplugins.segmentationstep.definitions import DEFAULT_TEXTURE_UPLOAD_COPIES, DEFAULT_QUANTIZE_SAMPLE_SLICES
+
+
+class SparseVolume(object):
+    '''
+    Provides the slices of an image stack on demand.  Slices are read
+    from a source volume (for example a memory mapped cache) when one
+    is given, otherwise they are decoded from the image files.  The
+    most recently used slices are kept in memory up to a budget in
+    bytes.  The budget also covers the DEFAULT_TEXTURE_UPLOAD_COPIES
+    copies of the slices made while they are uploaded to a texture:
+    the stacked slices, their bytes and either the padded pixels or
+    Zinc's buffer.
+
+    The slices can be reduced as they are read, downsampled by the
+    integer (z, y, x) factors and quantized to 8 bits.  The intensity
+    range for the quantization is sampled from up to
+    DEFAULT_QUANTIZE_SAMPLE_SLICES slices spread evenly through the
+    stack, intensities outside of the sampled range are clipped.
+    Slices may be paged in from a background thread.
+    '''
+
+    def __init__(self, image_files, budget, source_volume=None, factors=None, quantize_8bit=False):
+        self._image_files = image_files
+        self._budget = budget
+        self._source_volume = source_volume
+        self._factors = [1, 1, 1] if factors is None else [max(1, int(f)) for f in factors]
+        self._value_range = None
+        if quantize_8bit:
+            count = len(image_files)
+            samples = np.unique(np.linspace(0, count - 1, min(count, DEFAULT_QUANTIZE_SAMPLE_SLICES)).astype(int))
+            self._value_range = calculateValueRange([self._readSourceSlice(i) for i in samples])
+        self._slices = OrderedDict()
+        self._lock = Lock()
+        first_slice = self._readSlice(0)
+        self._shape = (int(ceil(len(image_files) / float(self._factors[0]))),) + first_slice.shape
+        self._dtype = first_slice.dtype
+        self._slices[0] = first_slice
+
+    def getShape(self):
+        return self._shape
+
+    def getDtype(self):
+        return self._dtype
+
+    def getSliceBytes(self):
+        return self._shape[1] * self._shape[2] * self._dtype.itemsize
+
+    def getCapacity(self):
+        '''
+        Returns the number of slices that fit in the budget, with their
+        copies for the texture, at least one.
+        '''
+        slice_bytes = self.getSliceBytes() * (1 + DEFAULT_TEXTURE_UPLOAD_COPIES)
+        return max(1, min(self._shape[0], self._budget // slice_bytes))
+
+    def _readSourceSlice(self, index):
+        if self._source_volume is not None:
+            return np.array(self._source_volume[index])
+
+        return decodeSlice(self._image_files[index])
+
+    def _readSlice(self, index):
+        fz = self._factors[0]
+        start = index * fz
+        stop = min(len(self._image_files), start + fz)
+        pixels = np.stack([self._readSourceSlice(i) for i in range(start, stop)])
+        if any(f > 1 for f in self._factors):
+            pixels = downsampleVolume(pixels, [stop - start] + self._factors[1:])
+        if self._value_range is not None:
+            pixels = quantizeVolume(pixels, self._value_range)
+
+        return pixels[0]
+
+    def getSlice(self, index):
+        with self._lock:
+            if index in self._slices:
+                self._slices.move_to_end(index)
+                return self._slices[index]
+
+        pixels = self._readSlice(index).astype(self._dtype, copy=False)
+        with self._lock:
+            self._slices[index] = pixels
+            while len(self._slices) > self.getCapacity():
+                self._slices.popitem(last=False)
+
+        return pixels
+
+    def hasSlice(self, index):
+        with self._lock:
+            return index in self._slices
+
+    def iterSlices(self, step=1):
+        '''
+        Yields every step'th slice, reading the slices that are not paged
+        in without adding them to the slices kept for the views.
+        '''
+        for index in range(0, self._shape[0], step):
+            with self._lock:
+                pixels = self._slices.get(index)
+            if pixels is None:
+                pixels = self._readSlice(index).astype(self._dtype, copy=False)
+            yield pixels
+
+    def getSlices(self, start, stop):
+        '''
+        Returns the slices in the range [start, stop) as a (z, y, x) array.
+        '''
+        slices = np.empty((stop - start,) + self._shape[1:], dtype=self._dtype)
+        for index in range(start, stop):
+            slices[index - start] = self.getSlice(index)
+
+        return slices
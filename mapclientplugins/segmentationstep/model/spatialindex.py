@@ -0,0 +1,216 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+from itertools import product
+
+import numpy as np
+
+from mapclientplugins.segmentationstep.model.coordinatestore import CoordinateStore
+from mapclientplugins.segmentationstep.definitions import DEFAULT_SPATIAL_INDEX_CELL_SIZE
+
+
+class SpatialIndex(CoordinateStore):
+    '''
+    A coordinate store that also sorts its nodes into a uniform grid of
+    cubic cells, the cells are updated as nodes are added, moved and
+    removed.  Nearest node and radius queries only look at the cells
+    around the query point, the query for nodes near a plane is a
+    single pass over the coordinate array.
+    '''
+
+    def __init__(self, cell_size=DEFAULT_SPATIAL_INDEX_CELL_SIZE):
+        super(SpatialIndex, self).__init__()
+        self._cell_size = float(cell_size)
+        self._cells = {}
+        self._node_cells = {}
+        self._lowest_cell = None
+        self._highest_cell = None
+
+    def clear(self):
+        super(SpatialIndex, self).clear()
+        self._cells = {}
+        self._node_cells = {}
+        self._lowest_cell = None
+        self._highest_cell = None
+
+    def extend(self, node_ids, locations):
+        super(SpatialIndex, self).extend(node_ids, locations)
+        self._updateCells(node_ids)
+
+    def remove(self, node_id):
+        super(SpatialIndex, self).remove(node_id)
+        cell = self._node_cells.pop(node_id, None)
+        if cell is not None:
+            self._removeFromCell(cell, node_id)
+
+    def setLocation(self, node_id, location):
+        super(SpatialIndex, self).setLocation(node_id, location)
+        self._updateCells([node_id])
+
+    def setLocations(self, node_ids, locations):
+        super(SpatialIndex, self).setLocations(node_ids, locations)
+        self._updateCells(node_ids)
+
+    def findWithinRadius(self, point, radius):
+        '''
+        Returns the identifiers of the nodes within the radius of the
+        point and their distances from it, nearest first.
+        '''
+        point = np.asarray(point, dtype=float)
+        node_ids = self._gatherNodes(self._getCell(point - radius), self._getCell(point + radius))
+        node_ids, distances = self._sortByDistance(point, node_ids)
+        count = np.searchsorted(distances, radius, side='right')
+
+        return node_ids[:count], distances[:count]
+
+    def findNearest(self, point, count=1):
+        '''
+        Returns the identifiers of the count nodes nearest to the point
+        and their distances from it, nearest first.  Fewer nodes are
+        returned if there are fewer than count nodes.
+        '''
+        point = np.asarray(point, dtype=float)
+        centre = self._getCell(point)
+        ring = 0
+        while True:
+            lower = centre - ring
+            upper = centre + ring
+            if _getCellCount(lower, upper) >= len(self._cells):
+                return self._sortByDistance(point, count=count)
+
+            node_ids = self._gatherNodes(lower, upper)
+            if len(node_ids) == 0 and ring == 0:
+                ring = max(1, self._getRingToNodes(centre))
+            elif len(node_ids) < count:
+                ring += 1
+            else:
+                node_ids, distances = self._sortByDistance(point, node_ids, count)
+                # Every node within ring cells of the point has been
+                # gathered, a node outside them could still be nearer
+                # than the furthest of these so widen the search to it.
+                if distances[-1] <= ring * self._cell_size:
+                    return node_ids, distances
+                ring = max(ring + 1, int(np.ceil(distances[-1] / self._cell_size)))
+
+    def findNearPlane(self, point, normal, distance):
+        '''
+        Returns the identifiers of the nodes within the distance of the
+        plane through the point with the given normal.
+        '''
+        normal = np.asarray(normal, dtype=float)
+        normal = normal / np.linalg.norm(normal)
+        size = len(self)
+        offsets = self._coordinates[:size].dot(normal)
+        offsets -= np.dot(point, normal)
+
+        return self._identifiers[:size][np.abs(offsets) <= distance]
+
+    def _getRingToNodes(self, centre):
+        '''
+        Returns the number of rings of cells around the centre cell
+        before the ring that reaches the bounding box of the cells that
+        have held nodes.  The bounding box only grows until the index
+        is cleared, so no ring with nodes in it is skipped.
+        '''
+        if self._lowest_cell is None:
+            return 0
+
+        return int(max(0, np.max(self._lowest_cell - centre), np.max(centre - self._highest_cell)))
+
+    def _getCell(self, location):
+        return np.floor(np.asarray(location) / self._cell_size).astype(np.int64)
+
+    def _updateCells(self, node_ids):
+        cells = self._getCell(self.getLocations(node_ids))
+        if len(cells):
+            lowest = cells.min(axis=0)
+            highest = cells.max(axis=0)
+            if self._lowest_cell is not None:
+                lowest = np.minimum(lowest, self._lowest_cell)
+                highest = np.maximum(highest, self._highest_cell)
+            self._lowest_cell = lowest
+            self._highest_cell = highest
+
+        for node_id, cell in zip(node_ids, map(tuple, cells.tolist())):
+            current_cell = self._node_cells.get(node_id)
+            if current_cell != cell:
+                if current_cell is not None:
+                    self._removeFromCell(current_cell, node_id)
+                self._node_cells[node_id] = cell
+                self._cells.setdefault(cell, set()).add(node_id)
+
+    def _removeFromCell(self, cell, node_id):
+        node_ids = self._cells[cell]
+        node_ids.discard(node_id)
+        if not node_ids:
+            del self._cells[cell]
+
+    def _gatherNodes(self, lower, upper):
+        '''
+        Returns the identifiers of the nodes in the cells from the lower
+        to the upper cell inclusive.  If there are more cells in the
+        range than there are occupied cells the occupied cells are
+        checked instead.
+        '''
+        if _getCellCount(lower, upper) >= len(self._cells):
+            lower = tuple(lower)
+            upper = tuple(upper)
+            node_ids = []
+            for cell, cell_node_ids in self._cells.items():
+                if all(l <= c <= u for l, c, u in zip(lower, cell, upper)):
+                    node_ids.extend(cell_node_ids)
+
+            return node_ids
+
+        node_ids = []
+        for cell in product(*[range(l, u + 1) for l, u in zip(lower.tolist(), upper.tolist())]):
+            if cell in self._cells:
+                node_ids.extend(self._cells[cell])
+
+        return node_ids
+
+    def _sortByDistance(self, point, node_ids=None, count=None):
+        '''
+        Returns the identifiers of the given nodes, or of all the nodes,
+        and their distances from the point, nearest first.  Only the
+        nearest count nodes are kept if a count is given.
+        '''
+        if node_ids is None:
+            locations = self.getLocations()
+            node_ids = self.getIdentifiers()
+        else:
+            node_ids = np.asarray(node_ids, dtype=np.int64)
+            locations = self.getLocations(node_ids)
+        offsets = locations - point
+        distances = np.einsum('ij,ij->i', offsets, offsets)
+        if count is not None and count < len(distances):
+            nearest = np.argpartition(distances, count - 1)[:count]
+            node_ids = node_ids[nearest]
+            distances = distances[nearest]
+        order = np.argsort(distances, kind='stable')
+
+        return node_ids[order], np.sqrt(distances[order])
+
+
+def _getCellCount(lower, upper):
+    count = 1
+    for l, u in zip(lower.tolist(), upper.tolist()):
+        count *= u - l + 1
+
+    return count
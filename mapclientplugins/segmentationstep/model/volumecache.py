@@ -0,0 +1,121 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_DIRECTORY_NAME = 'image_cache'
+CACHE_FILE_EXTENSION = '.npy'
+
+
+def fingerprintEntries(entries):
+    '''
+    Returns a key for a list of [name, size, mtime_ns] file entries.
+    The key changes if any file is added, removed, renamed or modified,
+    as long as the entries come from a stat of each file.  The entries
+    from a DirectoryIndex are only stat'ed again when the directory
+    changes, so a file rewritten in place keeps the same key, and the
+    cached volume, the cached DICOM headers and the shared volumes for
+    the old contents are still used, until then.
+    '''
+    sha = hashlib.sha1()
+    for entry in entries:
+        sha.update(json.dumps(list(entry)).encode('utf-8'))
+
+    return sha.hexdigest()
+
+
+def fingerprintFiles(filenames):
+    '''
+    Returns a key for the given files built from their names, sizes
+    and modification times.
+    '''
+    entries = []
+    for filename in filenames:
+        stat_result = os.stat(filename)
+        entries.append([os.path.basename(filename), stat_result.st_size, stat_result.st_mtime_ns])
+
+    return fingerprintEntries(entries)
+
+
+def fingerprintSource(source):
+    '''
+    Returns a short identifier for the image directory a volume was
+    loaded from, cached volumes are named after it.
+    '''
+    return hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:16]
+
+
+class VolumeCache(object):
+    '''
+    A persistent on disk cache of decoded image volumes.  A volume is
+    stored as a .npy file in a directory below the given location and
+    is memory mapped when it is loaded again.  Only the most recently
+    saved volume for each image directory is kept.  Volumes are looked
+    up by a key from the names, sizes and modification times of the
+    images, see fingerprintEntries(), not from their contents.
+    '''
+
+    def __init__(self, location):
+        self._directory = os.path.join(location, CACHE_DIRECTORY_NAME)
+
+    def _getFilename(self, key, source):
+        return os.path.join(self._directory, fingerprintSource(source) + '_' + key + CACHE_FILE_EXTENSION)
+
+    def load(self, key, source):
+        '''
+        Returns a read only memory map of the cached volume for the
+        given key, loaded from the source image directory, or None if
+        there is no valid cached volume.
+        '''
+        filename = self._getFilename(key, source)
+        if not os.path.isfile(filename):
+            return None
+
+        try:
+            return np.load(filename, mmap_mode='r')
+        except (IOError, ValueError):
+            return None
+
+    def save(self, key, volume, source):
+        '''
+        Write the volume to the cache under the given key, replacing
+        any volume previously cached from the source image directory.
+        '''
+        filename = self._getFilename(key, source)
+        temporary_filename = filename + '.part'
+        try:
+            if not os.path.exists(self._directory):
+                os.makedirs(self._directory)
+            with open(temporary_filename, 'wb') as f:
+                np.save(f, volume)
+            os.replace(temporary_filename, filename)
+            self._removeStale(key, source)
+        except IOError:
+            pass
+
+    def _removeStale(self, key, source):
+        current = os.path.basename(self._getFilename(key, source))
+        prefix = fingerprintSource(source) + '_'
+        for filename in os.listdir(self._directory):
+            if filename.startswith(prefix) and filename != current:
+                os.remove(os.path.join(self._directory, filename))
@@ -18,6 +18,7 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
     along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 """
 import json
+import heapq
 
 from mapclientplugins.segmentationstep.observed import event
 
@@ -45,6 +46,22 @@ class Plane(object):
         """
         pass
 
+    @event
+    def notifyInteractionStart(self):
+        """
+        Using this as an event notification call, the plane
+        is about to be dragged interactively.
+        """
+        pass
+
+    @event
+    def notifyInteractionEnd(self):
+        """
+        Using this as an event notification call, the plane
+        is no longer being dragged interactively.
+        """
+        pass
+
     def getRegion(self):
         return self._normal_field.getFieldmodule().getRegion()
 
@@ -112,34 +129,126 @@ class PlaneAttitude(object):
     prec = 12
 
     def __init__(self, point, normal):
-        self._point = point
-        self._normal = normal
+        self._point = _copyVector(point)
+        self._normal = _copyVector(normal)
+        self._key = None
 
     def serialize(self):
-        return json.dumps(self.__dict__)
+        return json.dumps({'_point': self._point, '_normal': self._normal})
 
     def deserialize(self, str_rep):
         self.__dict__ = json.loads(str_rep)
+        self._key = None
 
     def getNormal(self):
-        return self._normal
+        return _copyVector(self._normal)
+
+    def setNormal(self, normal):
+        self._normal = _copyVector(normal)
+        self._key = None
 
     def getPoint(self):
-        return self._point
+        return _copyVector(self._point)
 
     def setPoint(self, point):
-        self._point = point
+        self._point = _copyVector(point)
+        self._key = None
+
+    def getKey(self):
+        '''
+        Returns the point and normal scaled by 10**prec and truncated to
+        integers, attitudes with the same key are equal.  The point and
+        normal are only changed through the setters, which clear the
+        key, so the getters return copies.
+        '''
+        if self._key is None:
+            scale = 10 ** self.prec
+            self._key = tuple(int(v * scale) for v in self._point) + tuple(int(v * scale) for v in self._normal)
+
+        return self._key
 
     def __hash__(self, *args, **kwargs):
-        p = [str(int(v * (10 ** self.prec))) for v in self._point]
-        n = [str(int(v * (10 ** self.prec))) for v in self._normal]
-        str_repr = ''.join(p) + ''.join(n)
-        return hash(str_repr)
+        return hash(self.getKey())
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        return isinstance(other, PlaneAttitude) and self.getKey() == other.getKey()
 
     def __ne__(self, other):
-        return hash(self) != hash(other)
+        return not self == other
+
+
+def _copyVector(vector):
+    return None if vector is None else [float(v) for v in vector]
+
+
+class PlaneAttitudeStore(object):
+    '''
+    Holds each distinct plane attitude once in a numbered slot, an
+    attitude is found from its key without searching the slots.  An
+    emptied slot is None until it is reused, the lowest free slot is
+    reused first.
+    '''
+
+    def __init__(self):
+        self._plane_attitudes = []
+        self._slots = {}
+        self._free_slots = []
+
+    def __len__(self):
+        return len(self._plane_attitudes)
+
+    def __iter__(self):
+        return iter(self._plane_attitudes)
+
+    def __getitem__(self, slot):
+        return self._plane_attitudes[slot]
+
+    def clear(self):
+        self._plane_attitudes = []
+        self._slots = {}
+        self._free_slots = []
+
+    def find(self, plane_attitude):
+        '''
+        Returns the slot holding the plane attitude, or None.
+        '''
+        return self._slots.get(plane_attitude.getKey())
+
+    def add(self, plane_attitude):
+        '''
+        Returns the slot holding the plane attitude, putting the
+        attitude in a free slot if it is not already held.
+        '''
+        key = plane_attitude.getKey()
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free_slots:
+                slot = heapq.heappop(self._free_slots)
+                self._plane_attitudes[slot] = plane_attitude
+            else:
+                slot = len(self._plane_attitudes)
+                self._plane_attitudes.append(plane_attitude)
+            self._slots[key] = slot
+
+        return slot
+
+    def append(self, plane_attitude):
+        '''
+        Put the plane attitude, or None for a free slot, in a new slot
+        at the end of the store.  Used when restoring a saved store.
+        '''
+        slot = len(self._plane_attitudes)
+        self._plane_attitudes.append(plane_attitude)
+        if plane_attitude is None:
+            heapq.heappush(self._free_slots, slot)
+        else:
+            self._slots.setdefault(plane_attitude.getKey(), slot)
+
+    def remove(self, slot):
+        plane_attitude = self._plane_attitudes[slot]
+        if plane_attitude is not None:
+            del self._slots[plane_attitude.getKey()]
+            self._plane_attitudes[slot] = None
+            heapq.heappush(self._free_slots, slot)
 
 
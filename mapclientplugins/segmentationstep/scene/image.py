@@ -40,14 +40,41 @@ class ImageScene(object):
         image_region = self._model.getRegion()
         image_coordinate_field = self._model.getScaledCoordinateField()
         iso_scalar_field = self._model.getIsoScalarField()
+        texture_coordinate_field = self._model.getTextureCoordinateField()
         material = self._model.getMaterial()
 
-        self._plane_image_graphic = _createTextureSurface(image_region, image_coordinate_field, iso_scalar_field)
+        self._plane_image_graphic = _createTextureSurface(image_region, image_coordinate_field, iso_scalar_field, texture_coordinate_field)
         self._plane_image_graphic.setMaterial(material)
+        self._hidden_field = image_region.getFieldmodule().createFieldConstant([0.0])
+
+        plane_image = self._model.getPlaneImage()
+        plane_image_region = plane_image.getRegion()
+        self._plane_slice_graphic = _createPlaneSurface(plane_image_region, plane_image.getCoordinateField(), plane_image.getTextureCoordinateField())
+        self._plane_slice_graphic.setMaterial(plane_image.getMaterial())
+        self._plane_slice_hidden_field = plane_image_region.getFieldmodule().createFieldConstant([0.0])
+        plane_image.notifyActiveChange.addObserver(self._planeImageActiveChanged)
+        self._planeImageActiveChanged()
         self._image_outline = _createImageOutline(image_region, image_coordinate_field)
         self._coordinate_labels = _createNodeLabels(image_region, image_coordinate_field)
         self._coordinate_labels.setVisibilityFlag(False)
 
+    def _planeImageActiveChanged(self):
+        '''
+        Draw the image plane with either the plane image or the contour
+        of the image volume, the visibility flags are left for the user.
+        '''
+        active = self._model.getPlaneImage().isActive()
+        self._plane_image_graphic.setSubgroupField(self._hidden_field if active else Field())
+        self._plane_slice_graphic.setSubgroupField(Field() if active else self._plane_slice_hidden_field)
+
+    def setImagePlaneVisibility(self, state):
+        '''
+        The image plane is drawn by two graphics, the contour of the
+        image volume and the plane image, show or hide both of them.
+        '''
+        self._plane_image_graphic.setVisibilityFlag(state)
+        self._plane_slice_graphic.setVisibilityFlag(state)
+
     def getGraphic(self, name):
         graphic = None
         if name == ELEMENT_NODE_LABEL_GRAPHIC_NAME:
@@ -73,17 +100,15 @@ def _createImageOutline(region, finite_element_field):
 
     return outline
 
-def _createTextureSurface(region, coordinate_field, iso_scalar_field):
+def _createTextureSurface(region, coordinate_field, iso_scalar_field, texture_coordinate_field):
     scene = region.getScene()
 
-    fm = region.getFieldmodule()
-    xi = fm.findFieldByName('xi')
     scene.beginChange()
     # Create a surface graphic and set it's coordinate field
     # to the finite element coordinate field.
     iso_graphic = scene.createGraphicsContours()
     iso_graphic.setCoordinateField(coordinate_field)
-    iso_graphic.setTextureCoordinateField(xi)
+    iso_graphic.setTextureCoordinateField(texture_coordinate_field)
     iso_graphic.setIsoscalarField(iso_scalar_field)
     iso_graphic.setListIsovalues(0.0)
     iso_graphic.setName(IMAGE_PLANE_GRAPHIC_NAME)
@@ -92,6 +117,19 @@ def _createTextureSurface(region, coordinate_field, iso_scalar_field):
 
     return iso_graphic
 
+def _createPlaneSurface(region, coordinate_field, texture_coordinate_field):
+    scene = region.getScene()
+
+    scene.beginChange()
+    surface = scene.createGraphicsSurfaces()
+    surface.setCoordinateField(coordinate_field)
+    surface.setTextureCoordinateField(texture_coordinate_field)
+    surface.setName(IMAGE_PLANE_GRAPHIC_NAME)
+
+    scene.endChange()
+
+    return surface
+
 def _createNodeLabels(region, finite_element_field):
     scene = region.getScene()
 
@@ -34,6 +34,9 @@ class MasterScene(object):
     def getNodeScene(self):
         return self._node
 
+    def setImagePlaneVisibility(self, state):
+        self._image.setImagePlaneVisibility(state)
+
     def getGraphic(self, name):
         if name == ELEMENT_NODE_LABEL_GRAPHIC_NAME or name == IMAGE_PLANE_GRAPHIC_NAME or name == ELEMENT_OUTLINE_GRAPHIC_NAME:
             return self._image.getGraphic(name)
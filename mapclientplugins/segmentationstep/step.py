@@ -18,17 +18,25 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
     along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 '''
 import os
+import logging
+import time
+
+import numpy as np
 
 from PySide6 import QtGui, QtWidgets
 
 from mapclient.mountpoints.workflowstep import WorkflowStepMountPoint
 
 from mapclientplugins.segmentationstep.model.master import SegmentationModel
+from mapclientplugins.segmentationstep.model.imageloader import ImageLoader
 from mapclientplugins.segmentationstep.widgets.segmentationwidget import SegmentationWidget
 from mapclientplugins.segmentationstep.widgets.configuredialog import ConfigureDialog, ConfigureDialogState
+from mapclientplugins.segmentationstep.widgets.imageloaddialog import ImageLoadDialog
 
 STEP_SERIALISATION_FILENAME = 'step.conf'
 
+logger = logging.getLogger(__name__)
+
 class SegmentationStep(WorkflowStepMountPoint):
     '''
     A step that acts like the step plugin duck
@@ -48,9 +56,10 @@ class SegmentationStep(WorkflowStepMountPoint):
         self.addPort(('http://physiomeproject.org/workflow/1.0/rdf-schema#port',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#provides',
                       'http://physiomeproject.org/workflow/1.0/rdf-schema#pointcloud'))
-        self._model = SegmentationModel()
+        self._model = None
         self._category = 'Segmentation'
         self._view = None
+        self._load_dialog = None
         self._dataIn = None
 #        self._configured = True
         self._state = ConfigureDialogState()
@@ -80,19 +89,87 @@ class SegmentationStep(WorkflowStepMountPoint):
         d = ConfigureDialog(self._state)
         self._configured = d.validate()
 
+    def _getSerializationLocation(self):
+        return os.path.join(self._location, self.getIdentifier())
+
     def setPortData(self, portId, dataIn):
         self._dataIn = dataIn
 
     def getPortData(self, portId):
+        '''
+        Returns the segmented point cloud, it is empty if the step has
+        not been run, without creating the model.
+        '''
+        if self._model is None:
+            return np.empty((0, 3)) if self._state.pointCloudArray() else []
+
+        if self._state.pointCloudArray():
+            return self._model.getPointCloudArray()
+
         return self._model.getPointCloud()
 
+    def _getModel(self):
+        '''
+        Create the segmentation model the first time it is needed, the
+        model sets up a Zinc context with its materials, glyphs and
+        regions which is wasted on steps that are never run.  The time
+        taken is logged.
+        '''
+        if self._model is None:
+            start = time.perf_counter()
+            self._model = SegmentationModel()
+            logger.debug('Created the segmentation model in %.1f ms', 1000.0 * (time.perf_counter() - start))
+
+        return self._model
+
     def execute(self):
         if self._view is None:
-            self._model.loadImages(self._dataIn)
-            self._model.initialize()
-            self._view = SegmentationWidget(self._model)
-            self._view.setSerializationLocation(os.path.join(self._location, self.getIdentifier()))
-            self._view.registerDoneExecution(self._doneExecution)
+            self._loadImages()
+        else:
+            self._showView()
+
+    def _loadImages(self):
+        '''
+        Load the images on a worker thread, the view is only created
+        once the images have been loaded.
+        '''
+        if self._load_dialog is None:
+            image_model = self._getModel().getImageModel()
+            image_model.setDecodeInParallel(self._state.decodeInParallel())
+            image_model.setCacheLocation(self._getSerializationLocation(), self._state.compressCache())
+            image_model.setCacheImages(self._state.cacheImages())
+            image_model.setSparseLoading(self._state.sparseLoading())
+            image_model.setMemoryBudget(self._state.memoryBudget())
+            image_model.setDownsampleFactors(self._state.downsampleFactors())
+            image_model.setQuantize8Bit(self._state.quantize8Bit())
+            image_model.setPlaneTextureOnly(self._state.planeTextureOnly())
+            image_model.setDicomSliceOrder(self._state.dicomSliceOrder())
+            loader = ImageLoader(self._model, self._dataIn)
+            self._load_dialog = ImageLoadDialog(loader, QtWidgets.QApplication.activeWindow())
+            self._load_dialog.registerLoadedCallback(self._imagesLoaded)
+            self._load_dialog.registerCancelledCallback(self._imagesNotLoaded)
+            self._load_dialog.start()
+
+    def _imagesLoaded(self):
+        self._load_dialog = None
+        self._model.initialize()
+        self._view = SegmentationWidget(self._model)
+        self._view.setSerializationLocation(self._getSerializationLocation())
+        self._view.registerDoneExecution(self._doneExecution)
+        self._showView()
+
+    def _imagesNotLoaded(self):
+        '''
+        The load was cancelled, or it failed and the load dialog has
+        reported the failure.  Drop the partly loaded model so that the
+        images are loaded afresh next time, and finish so that the
+        workflow is not left waiting on this step.
+        '''
+        self._load_dialog = None
+        self._model.getImageModel().unloadImages()
+        self._model = None
+        self._doneExecution()
 
+    def _showView(self):
         self._setCurrentUndoRedoStack(self._model.getUndoRedoStack())
         self._setCurrentWidget(self._view)
@@ -42,11 +42,15 @@ class CurveTool(SegmentationTool):
         self._handlers[ViewType.VIEW_2D] = Curve2D(plane, undo_redo_stack)
         self._handlers[ViewType.VIEW_3D] = Curve3D(plane, undo_redo_stack)
         self._step_size = DEFAULT_PUSH_PULL_STEP_SIZE
+        self._set_step_size_method = None
         self._interpolation_count = DEFAULT_INTERPOLATION_COUNT
 
     def setGetDimensionsMethod(self, get_dimensions_method):
         self._handlers[ViewType.VIEW_2D].setGetDimensionsMethod(get_dimensions_method)
 
+    def setSetStepSizeMethod(self, set_step_size_method):
+        self._set_step_size_method = set_step_size_method
+
     def setModel(self, model):
         self._model = model
         self._handlers[ViewType.VIEW_2D].setModel(model)
@@ -77,6 +81,8 @@ class CurveTool(SegmentationTool):
             c = CommandSetSingleParameterMethod(self._step_size, value)
             c.setSingleParameterMethod(self._setStepSize)
             self._step_size = value
+            if self._set_step_size_method is not None:
+                self._set_step_size_method(value)
 
             self._undo_redo_stack.push(c)
 
@@ -84,6 +90,8 @@ class CurveTool(SegmentationTool):
         self._widget._ui._doubleSpinBoxStepSize.blockSignals(True)
         self._widget._ui._doubleSpinBoxStepSize.setValue(value)
         self._widget._ui._doubleSpinBoxStepSize.blockSignals(False)
+        if self._set_step_size_method is not None:
+            self._set_step_size_method(value)
 
     def interpolationCountChanged(self, value):
         if value != self._interpolation_count:
@@ -43,6 +43,11 @@ class Normal(PlaneAdjust):
         setGlyphPosition(self._glyph, calculateCentroid(self._plane.getRotationPoint(), self._plane.getNormal(), self._get_dimension_method()))
         scene.endChange()
 
+    def mousePressEvent(self, event):
+        super(Normal, self).mousePressEvent(event)
+        if self._glyph.getMaterial().getName() == self._selected_material.getName():
+            self._beginPlaneInteraction()
+
     def mouseMoveEvent(self, event):
         if self._glyph.getMaterial().getName() == self._selected_material.getName():
             pixel_scale = self._zinc_view.getPixelScale()
@@ -52,6 +52,11 @@ class Orientation(PlaneAdjust):
     def setGetViewParametersMethod(self, get_view_parameters_method):
         self._getViewParameters_method = get_view_parameters_method
 
+    def mousePressEvent(self, event):
+        super(Orientation, self).mousePressEvent(event)
+        if self._glyph.getMaterial().getName() != self._selected_material.getName():
+            self._beginPlaneInteraction()
+
     def mouseMoveEvent(self, event):
         scene = self._glyph.getScene()
         scene.beginChange()
@@ -33,6 +33,7 @@ class PlaneAdjust(AbstractHandler):
         self._plane_attitude_end = None
         self._default_material = None
         self._selected_material = None
+        self._plane_interaction = False
 
     def setGlyph(self, glyph):
         self._glyph = glyph
@@ -67,6 +68,15 @@ class PlaneAdjust(AbstractHandler):
 
             self._undo_redo_stack.endMacro()
 
+    def _beginPlaneInteraction(self):
+        self._plane_interaction = True
+        self._plane.notifyInteractionStart()
+
+    def _endPlaneInteraction(self):
+        if self._plane_interaction:
+            self._plane_interaction = False
+            self._plane.notifyInteractionEnd()
+
     def mousePressEvent(self, event):
         pixel_scale = self._zinc_view.getPixelScale()
         x = event.x() * pixel_scale
@@ -85,3 +95,4 @@ class PlaneAdjust(AbstractHandler):
             self._glyph.setMaterial(self._default_material)
         else:
             super(PlaneAdjust, self).mouseReleaseEvent(event)
+        self._endPlaneInteraction()
@@ -40,10 +40,14 @@ class PointTool(SegmentationTool):
         self._model = None
         self._plane = plane
         self._step_size = DEFAULT_PUSH_PULL_STEP_SIZE
+        self._set_step_size_method = None
 
     def setGetDimensionsMethod(self, get_dimensions_method):
         self._handlers[ViewType.VIEW_2D].setGetDimensionsMethod(get_dimensions_method)
 
+    def setSetStepSizeMethod(self, set_step_size_method):
+        self._set_step_size_method = set_step_size_method
+
     def setModel(self, model):
         self._model = model
         self._handlers[ViewType.VIEW_2D].setModel(model)
@@ -69,6 +73,8 @@ class PointTool(SegmentationTool):
             c = CommandSetSingleParameterMethod(self._step_size, value)
             c.setSingleParameterMethod(self._setStepSize)
             self._step_size = value
+            if self._set_step_size_method is not None:
+                self._set_step_size_method(value)
 
             self._undo_redo_stack.push(c)
 
@@ -76,6 +82,8 @@ class PointTool(SegmentationTool):
         self._widget._ui._doubleSpinBoxStepSize.blockSignals(True)
         self._widget._ui._doubleSpinBoxStepSize.setValue(value)
         self._widget._ui._doubleSpinBoxStepSize.blockSignals(False)
+        if self._set_step_size_method is not None:
+            self._set_step_size_method(value)
 
     def streamingCreateChanged(self, state):
         new = True if state == 2 else False
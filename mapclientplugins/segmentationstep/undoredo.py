@@ -167,21 +167,24 @@ class CommandSetGraphicVisibility(CommandCurrentNew):
     def __init__(self, current, new):
         super(CommandSetGraphicVisibility, self).__init__(current, new)
         self.setText('Graphic Visibility')
-        self._graphic = None
+        self._set_visibility_method = None
         self._check_box = None
 
     def setGraphic(self, graphic):
-        self._graphic = graphic
+        self._set_visibility_method = graphic.setVisibilityFlag
+
+    def setSetVisibilityMethod(self, method):
+        self._set_visibility_method = method
 
     def setCheckBox(self, check_box):
         self._check_box = check_box
 
     def redo(self):
-        self._graphic.setVisibilityFlag(self._new)
+        self._set_visibility_method(self._new)
         self._check_box.setChecked(self._new)
 
     def undo(self):
-        self._graphic.setVisibilityFlag(self._current)
+        self._set_visibility_method(self._current)
         self._check_box.setChecked(self._current)
 
 
@@ -381,9 +384,7 @@ class CommandDelete(QtGui.QUndoCommand):
         super(CommandDelete, self).__init__()
         self.setText('Delete')
         self._model = model
-        self._node_statuses = []
-        for node_id in selected:
-            self._node_statuses.append(model.getNodeStatus(node_id))
+        self._node_statuses = model.getNodeStatuses(selected)
 
     def redo(self):
         region = self._model.getRegion()
@@ -424,9 +425,7 @@ class CommandDeleteCurve(QtGui.QUndoCommand):
                 different_curves.append(curve_identifier)
                 self._curves[curve_identifier] = curve
                 self._interpolation_counts[curve_identifier] = curve.getInterpolationCount()
-                self._node_statuses[curve_identifier] = []
-                for curve_node_id in curve.getNodes():
-                    self._node_statuses[curve_identifier].append(model.getNodeStatus(curve_node_id))
+                self._node_statuses[curve_identifier] = model.getNodeStatuses(curve.getNodes())
 
     def setScene(self, scene):
         self._scene = scene
@@ -22,6 +22,8 @@ import json
 from PySide6 import QtWidgets
 
 from mapclientplugins.segmentationstep.widgets.ui_configuredialog import Ui_ConfigureDialog
+from mapclientplugins.segmentationstep.model.slicedecoder import isDecoderAvailable
+from mapclientplugins.segmentationstep.definitions import DEFAULT_MEMORY_BUDGET_MB
 
 REQUIRED_STYLE_SHEET = 'border: 1px solid red; border-radius: 3px'
 DEFAULT_STYLE_SHEET = 'border: 1px solid gray; border-radius: 3px'
@@ -31,8 +33,20 @@ class ConfigureDialogState(object):
     Class to encapsulate the state of the configure dialog so that the 
     dialog state can be persistent.
     '''
-    def __init__(self, identifier=''):
+    def __init__(self, identifier='', decode_in_parallel=False, sparse_loading=False, memory_budget=DEFAULT_MEMORY_BUDGET_MB,
+                 downsample_factors=None, quantize_8bit=False, plane_texture_only=False,
+                 compress_cache=False, point_cloud_array=False, dicom_slice_order=False, cache_images=False):
         self._identifier = identifier
+        self._decode_in_parallel = decode_in_parallel
+        self._sparse_loading = sparse_loading
+        self._memory_budget = memory_budget
+        self._downsample_factors = [1, 1, 1] if downsample_factors is None else downsample_factors
+        self._quantize_8bit = quantize_8bit
+        self._plane_texture_only = plane_texture_only
+        self._compress_cache = compress_cache
+        self._point_cloud_array = point_cloud_array
+        self._dicom_slice_order = dicom_slice_order
+        self._cache_images = cache_images
 
     def identifier(self):
         return self._identifier
@@ -40,6 +54,36 @@ class ConfigureDialogState(object):
     def setIdentifier(self, identifier):
         self._identifier = identifier
 
+    def decodeInParallel(self):
+        return self._decode_in_parallel
+
+    def sparseLoading(self):
+        return self._sparse_loading
+
+    def memoryBudget(self):
+        return self._memory_budget
+
+    def downsampleFactors(self):
+        return self._downsample_factors
+
+    def quantize8Bit(self):
+        return self._quantize_8bit
+
+    def planeTextureOnly(self):
+        return self._plane_texture_only
+
+    def compressCache(self):
+        return self._compress_cache
+
+    def pointCloudArray(self):
+        return self._point_cloud_array
+
+    def dicomSliceOrder(self):
+        return self._dicom_slice_order
+
+    def cacheImages(self):
+        return self._cache_images
+
     def serialize(self):
         return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
 
@@ -64,17 +108,56 @@ class ConfigureDialog(QtWidgets.QDialog):
 
         self.setState(state)
         self.validate()
+        self._disableDecoderOptions()
         self._makeConnections()
 
+    def _disableDecoderOptions(self):
+        '''
+        Decoding in parallel, caching, loading on demand, downsampling,
+        quantizing and reslicing the plane image all work on the decoded
+        images, without Pillow or pydicom Zinc reads the images as they
+        are.
+        '''
+        if isDecoderAvailable():
+            return
+
+        for widget in [self._ui.decodeInParallelCheckBox, self._ui.cacheImagesCheckBox, self._ui.compressCacheCheckBox,
+                       self._ui.sparseLoadingCheckBox, self._ui.label_3, self._ui.downsampleXSpinBox,
+                       self._ui.downsampleYSpinBox, self._ui.downsampleZSpinBox, self._ui.quantizeCheckBox,
+                       self._ui.planeTextureCheckBox]:
+            widget.setEnabled(False)
+
     def _makeConnections(self):
         self._ui.identifierLineEdit.textChanged.connect(self.validate)
 
     def setState(self, state):
         self._ui.identifierLineEdit.setText(state._identifier)
+        self._ui.decodeInParallelCheckBox.setChecked(state._decode_in_parallel)
+        self._ui.sparseLoadingCheckBox.setChecked(state._sparse_loading)
+        self._ui.memoryBudgetSpinBox.setValue(state._memory_budget)
+        self._ui.downsampleXSpinBox.setValue(state._downsample_factors[0])
+        self._ui.downsampleYSpinBox.setValue(state._downsample_factors[1])
+        self._ui.downsampleZSpinBox.setValue(state._downsample_factors[2])
+        self._ui.quantizeCheckBox.setChecked(state._quantize_8bit)
+        self._ui.planeTextureCheckBox.setChecked(state._plane_texture_only)
+        self._ui.compressCacheCheckBox.setChecked(state._compress_cache)
+        self._ui.pointCloudArrayCheckBox.setChecked(state._point_cloud_array)
+        self._ui.dicomSliceOrderCheckBox.setChecked(state._dicom_slice_order)
+        self._ui.cacheImagesCheckBox.setChecked(state._cache_images)
 
     def getState(self):
         state = ConfigureDialogState(
-            self._ui.identifierLineEdit.text())
+            self._ui.identifierLineEdit.text(),
+            self._ui.decodeInParallelCheckBox.isChecked(),
+            self._ui.sparseLoadingCheckBox.isChecked(),
+            self._ui.memoryBudgetSpinBox.value(),
+            [self._ui.downsampleXSpinBox.value(), self._ui.downsampleYSpinBox.value(), self._ui.downsampleZSpinBox.value()],
+            self._ui.quantizeCheckBox.isChecked(),
+            self._ui.planeTextureCheckBox.isChecked(),
+            self._ui.compressCacheCheckBox.isChecked(),
+            self._ui.pointCloudArrayCheckBox.isChecked(),
+            self._ui.dicomSliceOrderCheckBox.isChecked(),
+            self._ui.cacheImagesCheckBox.isChecked())
 
         return state
 
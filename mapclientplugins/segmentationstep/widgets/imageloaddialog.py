@@ -0,0 +1,121 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+    
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import os
+
+from PySide6 import QtCore, QtWidgets
+
+
+class ImageLoadDialog(QtWidgets.QProgressDialog):
+    '''
+    Progress dialog that runs an image loader and reports on its
+    progress.  Cancelling the dialog interrupts the loader.
+    '''
+
+    def __init__(self, loader, parent=None):
+        '''
+        Constructor
+        '''
+        super(ImageLoadDialog, self).__init__('Loading images ...', 'Cancel', 0, 0, parent)
+        self.setWindowTitle('Segmentation')
+        self.setWindowModality(QtCore.Qt.WindowModal)
+        self.setMinimumDuration(0)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+
+        self._loader = loader
+        self._loaded_callback = None
+        self._message = None
+        self._cancelled_callback = None
+
+        self._makeConnections()
+
+    def _makeConnections(self):
+        self._loader.progressChanged.connect(self._progressChanged)
+        self._loader.messageChanged.connect(self._messageChanged)
+        self._loader.loadFinished.connect(self._loadFinished)
+        self._loader.loadCancelled.connect(self._loadCancelled)
+        self._loader.loadFailed.connect(self._loadFailed)
+        self.canceled.connect(self._cancelClicked)
+
+    def registerLoadedCallback(self, callback):
+        self._loaded_callback = callback
+
+    def registerCancelledCallback(self, callback):
+        self._cancelled_callback = callback
+
+    def start(self):
+        self.show()
+        self._loader.start()
+
+    def _progressChanged(self, index, count, filename):
+        # The final step is decoding the images into Zinc.
+        self.setMaximum(count + 1)
+        self.setValue(index)
+        if filename:
+            self._setLabelText('Loading ' + os.path.basename(filename) + ' (' + str(index + 1) + ' of ' + str(count) + ')')
+        else:
+            self._setLabelText('Reading images into Zinc ...')
+
+    def _messageChanged(self, message):
+        self._message = message
+        self._setLabelText(self.labelText())
+
+    def _setLabelText(self, text):
+        '''
+        Show the text below any message from the loader, which stays
+        until the load finishes.
+        '''
+        if self._message is not None and not text.startswith(self._message):
+            text = self._message + '\n' + text
+        self.setLabelText(text)
+
+    def _cancelClicked(self):
+        self._setLabelText('Cancelling ...')
+        self._loader.requestInterruption()
+
+    def _finishLoad(self):
+        self._loader.wait()
+        self.close()
+
+    def _loadFinished(self):
+        self._loader.wait()
+        # The decoded images are passed to Zinc on the main thread, this
+        # can not be cancelled.
+        self.setCancelButton(None)
+        self._setLabelText('Setting up the images ...')
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+        try:
+            if self._loaded_callback is not None:
+                self._loaded_callback()
+        except Exception as e:
+            self._loadFailed(str(e))
+        finally:
+            self.close()
+
+    def _loadCancelled(self):
+        self._finishLoad()
+        if self._cancelled_callback is not None:
+            self._cancelled_callback()
+
+    def _loadFailed(self, message):
+        self._finishLoad()
+        QtWidgets.QMessageBox.warning(self.parentWidget(), 'Segmentation', 'Failed to load images: ' + message)
+        if self._cancelled_callback is not None:
+            self._cancelled_callback()
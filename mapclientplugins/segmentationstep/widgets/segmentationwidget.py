@@ -18,17 +18,23 @@ This file is part of MAP Client. (http://launchpad.net/mapclient)
     along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 '''
 from PySide6 import QtCore, QtGui, QtWidgets
+from shiboken6 import isValid
 
 from mapclientplugins.segmentationstep.tools import normal, orientation, point, curve, resetorientation
 from mapclientplugins.segmentationstep.widgets.ui_segmentationwidget import Ui_SegmentationWidget
-from mapclientplugins.segmentationstep.undoredo import CommandSetScale, CommandSetSingleParameterMethod, CommandSetGraphicVisibility, CommandSetGlyphSize
+from mapclientplugins.segmentationstep.undoredo import CommandSetScale, CommandSetSingleParameterMethod, CommandSetGraphicVisibility, CommandSetGlyphSize, \
+    CommandMovePlane
 from mapclientplugins.segmentationstep.widgets.zincwidget import ProjectionMode
-from mapclientplugins.segmentationstep.definitions import ViewMode, ViewType, ELEMENT_OUTLINE_GRAPHIC_NAME, IMAGE_PLANE_GRAPHIC_NAME, ELEMENT_NODE_LABEL_GRAPHIC_NAME
+from mapclientplugins.segmentationstep.definitions import ViewMode, ViewType, ELEMENT_OUTLINE_GRAPHIC_NAME, ELEMENT_NODE_LABEL_GRAPHIC_NAME
 from mapclientplugins.segmentationstep.widgets.segmentationstate import SegmentationState
 from mapclientplugins.segmentationstep.zincutils import getGlyphSize, setGlyphSize
 from mapclientplugins.segmentationstep.widgets.sceneviewertab import SceneviewerTab
 from mapclientplugins.segmentationstep.scene.master import MasterScene
+from mapclientplugins.segmentationstep.model.intensitystatistics import IntensityStatistics
+from mapclientplugins.segmentationstep.model.previewcache import ThumbnailBuilder
+from mapclientplugins.segmentationstep.widgets.thumbnailstrip import ThumbnailStrip
 import os
+from functools import partial
 
 class SegmentationWidget(QtWidgets.QWidget):
     """
@@ -61,6 +67,77 @@ class SegmentationWidget(QtWidgets.QWidget):
         self._setupUi()
 
         self._makeConnections()
+        self._setupThumbnailStrip()
+        self._startIntensityStatistics()
+        self.destroyed.connect(partial(_stopThreads, self._getBackgroundThreads()))
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self._stopBackgroundThreads)
+
+    def _getBackgroundThreads(self):
+        return [thread for thread in [self._thumbnail_builder, self._intensity_statistics] if thread is not None]
+
+    def _stopBackgroundThreads(self):
+        _stopThreads(self._getBackgroundThreads())
+
+    def closeEvent(self, event):
+        self._stopBackgroundThreads()
+        super(SegmentationWidget, self).closeEvent(event)
+
+    def _setupThumbnailStrip(self):
+        '''
+        Show a strip of slice thumbnails, built in the background, that
+        moves the image plane to a slice when its thumbnail is clicked.
+        There is no strip when the image model has no volume to build
+        the thumbnails from, see ImageModel.getPreviewCache().
+        '''
+        self._thumbnail_strip = None
+        self._thumbnail_builder = None
+        image_model = self._model.getImageModel()
+        preview_cache = image_model.getPreviewCache()
+        if preview_cache is not None:
+            self._thumbnail_strip = ThumbnailStrip(preview_cache, self)
+            self._thumbnail_strip.setWindow(image_model.getWindow())
+            self._thumbnail_strip.sliceSelected.connect(self._thumbnailSelected)
+            self._ui.verticalLayout.addWidget(self._thumbnail_strip)
+            self._thumbnail_builder = ThumbnailBuilder(image_model.getVolume(), preview_cache)
+            self._thumbnail_builder.thumbnailReady.connect(self._thumbnail_strip.thumbnailReady)
+            self._thumbnail_builder.start()
+
+    def _thumbnailSelected(self, index):
+        image_model = self._model.getImageModel()
+        plane = image_model.getPlane()
+        c = CommandMovePlane(plane, plane.getAttitude(), image_model.calculateSlicePlaneAttitude(index))
+        self._model.getUndoRedoStack().push(c)
+
+    def _startIntensityStatistics(self):
+        '''
+        Work out the intensity window of the images in the background,
+        the window is refined as more of the voxels are counted.  Only
+        the plane image and the thumbnails follow the refinements, the
+        textures of the volume are windowed once when all the voxels
+        have been counted, see ImageModel.setWindow().  The thread is not a child of the widget so
+        that it can be stopped and waited on when the widget is
+        destroyed.
+        '''
+        self._intensity_statistics = None
+        volume = self._model.getImageModel().getStatisticsVolume()
+        if volume is not None:
+            self._intensity_statistics = IntensityStatistics(volume)
+            self._intensity_statistics.windowChanged.connect(self._intensityWindowChanged)
+            self._intensity_statistics.finished.connect(self._intensityStatisticsFinished)
+            self._intensity_statistics.start()
+
+    def _intensityWindowChanged(self, low, high):
+        image_model = self._model.getImageModel()
+        window = image_model.getWindow()
+        image_model.setWindow(low, high, refine=True)
+        if self._thumbnail_strip is not None and image_model.getWindow() != window:
+            self._thumbnail_strip.setWindow(image_model.getWindow())
+
+    def _intensityStatisticsFinished(self):
+        image_model = self._model.getImageModel()
+        window = image_model.getWindow()
+        if window is not None and not self._intensity_statistics.isInterruptionRequested():
+            image_model.setWindow(*window)
 
     def _makeConnections(self):
         self._ui._lineEditWidthScale.editingFinished.connect(self._scaleChanged)
@@ -212,17 +289,14 @@ class SegmentationWidget(QtWidgets.QWidget):
 
     def _graphicVisibilityChanged(self):
         check_box = self.sender()
-        graphic = None
+        c = CommandSetGraphicVisibility(not check_box.isChecked(), check_box.isChecked())
+        c.setCheckBox(check_box)
         if check_box == self._ui._checkBoxCoordinateLabels:
-            graphic = self._scene.getGraphic(ELEMENT_NODE_LABEL_GRAPHIC_NAME)
+            c.setGraphic(self._scene.getGraphic(ELEMENT_NODE_LABEL_GRAPHIC_NAME))
         elif check_box == self._ui._checkBoxImagePlane:
-            graphic = self._scene.getGraphic(IMAGE_PLANE_GRAPHIC_NAME)
+            c.setSetVisibilityMethod(self._scene.setImagePlaneVisibility)
         elif check_box == self._ui._checkBoxImageOutline:
-            graphic = self._scene.getGraphic(ELEMENT_OUTLINE_GRAPHIC_NAME)
-
-        c = CommandSetGraphicVisibility(not check_box.isChecked(), check_box.isChecked())
-        c.setCheckBox(check_box)
-        c.setGraphic(graphic)
+            c.setGraphic(self._scene.getGraphic(ELEMENT_OUTLINE_GRAPHIC_NAME))
 
         self._model.getUndoRedoStack().push(c)
 
@@ -325,6 +399,7 @@ class SegmentationWidget(QtWidgets.QWidget):
         point_tool.setModel(node_model)
         point_tool.setScene(node_scene)
         point_tool.setGetDimensionsMethod(image_model.getDimensions)
+        point_tool.setSetStepSizeMethod(image_model.setPushPullStepSize)
         w = point_tool.getPropertiesWidget()
         self._ui._toolTab.addItem(w, point_tool.getName())
 
@@ -346,6 +421,7 @@ class SegmentationWidget(QtWidgets.QWidget):
         curve_tool.setModel(node_model)
         curve_tool.setScene(node_scene)
         curve_tool.setGetDimensionsMethod(image_model.getDimensions)
+        curve_tool.setSetStepSizeMethod(image_model.setPushPullStepSize)
         w = curve_tool.getPropertiesWidget()
         self._ui._toolTab.addItem(w, curve_tool.getName())
 
@@ -366,3 +442,15 @@ class SegmentationWidget(QtWidgets.QWidget):
         self._tools[ViewMode.PLANE_NORMAL] = normal_tool
         self._tools[ViewMode.PLANE_ROTATION] = rotation_tool
         self._tools[ViewMode.SEGMENT_CURVE] = curve_tool
+
+
+def _stopThreads(threads):
+    '''
+    Interrupt the threads and wait for them to finish, skipping any
+    that Qt has already deleted.
+    '''
+    threads = [thread for thread in threads if isValid(thread)]
+    for thread in threads:
+        thread.requestInterruption()
+    for thread in threads:
+        thread.wait()
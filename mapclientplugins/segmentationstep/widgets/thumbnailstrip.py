@@ -0,0 +1,88 @@
+'''
+MAP Client, a program to generate detailed musculoskeletal models for OpenSim.
+    Copyright (C) 2012  University of Auckland
+
+This file is part of MAP Client. (http://launchpad.net/mapclient)
+
+    MAP Client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    MAP Client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
+'''
+import numpy as np
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from mapclientplugins.segmentationstep.maths.imageops import applyWindow
+from mapclientplugins.segmentationstep.definitions import DEFAULT_THUMBNAIL_SIZE
+
+
+class ThumbnailStrip(QtWidgets.QListWidget):
+    '''
+    A horizontal strip of the slice thumbnails from a preview cache,
+    scrolling through the strip only reads the preview cache.
+    sliceSelected is emitted with the index of a slice when its
+    thumbnail is clicked.
+    '''
+
+    sliceSelected = QtCore.Signal(int)
+
+    def __init__(self, preview_cache, parent=None):
+        super(ThumbnailStrip, self).__init__(parent)
+        self._preview_cache = preview_cache
+        self._window = None
+
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setIconSize(QtCore.QSize(DEFAULT_THUMBNAIL_SIZE, DEFAULT_THUMBNAIL_SIZE))
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
+        self.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setFixedHeight(DEFAULT_THUMBNAIL_SIZE + 2 * self.fontMetrics().height() + self.horizontalScrollBar().sizeHint().height())
+        for index in range(len(preview_cache)):
+            self.addItem(QtWidgets.QListWidgetItem(str(index + 1)))
+
+        self.itemClicked.connect(self._itemClicked)
+
+    def setWindow(self, window):
+        '''
+        Set the (low, high) intensity window used to show the thumbnails
+        and redraw the thumbnails that have been built.
+        '''
+        self._window = window
+        for index in range(len(self._preview_cache)):
+            self.thumbnailReady(index)
+
+    def thumbnailReady(self, index):
+        thumbnail = self._preview_cache.getThumbnail(index)
+        if thumbnail is not None:
+            self.item(index).setIcon(QtGui.QIcon(QtGui.QPixmap.fromImage(_createGrayscaleImage(thumbnail, self._window))))
+
+    def _itemClicked(self, item):
+        self.sliceSelected.emit(self.row(item))
+
+
+def _createGrayscaleImage(pixels, window):
+    '''
+    Returns an 8 bit QImage of the unsigned integer pixels, stretching
+    the (low, high) intensity window, or the range of the pixels if
+    there is no window, over the grey levels.
+    '''
+    if window is None:
+        window = (int(pixels.min()), max(int(pixels.max()), int(pixels.min()) + 1))
+    pixels = applyWindow(pixels, window)
+    pixels = np.ascontiguousarray(pixels >> (8 * (pixels.dtype.itemsize - 1)), dtype=np.uint8)
+    height, width = pixels.shape
+    image = QtGui.QImage(pixels.data, width, height, width, QtGui.QImage.Format_Grayscale8)
+
+    return image.copy()
@@ -15,9 +15,10 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QAbstractButton, QApplication, QDialog, QDialogButtonBox,
-    QGroupBox, QHBoxLayout, QLabel, QLineEdit,
-    QSizePolicy, QSpacerItem, QVBoxLayout, QWidget)
+from PySide6.QtWidgets import (QAbstractButton, QApplication, QCheckBox, QDialog,
+    QDialogButtonBox, QGroupBox, QHBoxLayout, QLabel,
+    QLineEdit, QSizePolicy, QSpacerItem, QSpinBox,
+    QVBoxLayout, QWidget)
 from  . import resources_rc
 
 class Ui_ConfigureDialog(object):
@@ -46,6 +47,96 @@ class Ui_ConfigureDialog(object):
 
         self.verticalLayout.addLayout(self.horizontalLayout)
 
+        self.decodeInParallelCheckBox = QCheckBox(self.groupBox)
+        self.decodeInParallelCheckBox.setObjectName(u"decodeInParallelCheckBox")
+
+        self.verticalLayout.addWidget(self.decodeInParallelCheckBox)
+
+        self.sparseLoadingCheckBox = QCheckBox(self.groupBox)
+        self.sparseLoadingCheckBox.setObjectName(u"sparseLoadingCheckBox")
+
+        self.verticalLayout.addWidget(self.sparseLoadingCheckBox)
+
+        self.horizontalLayout_2 = QHBoxLayout()
+        self.horizontalLayout_2.setObjectName(u"horizontalLayout_2")
+        self.label_2 = QLabel(self.groupBox)
+        self.label_2.setObjectName(u"label_2")
+
+        self.horizontalLayout_2.addWidget(self.label_2)
+
+        self.memoryBudgetSpinBox = QSpinBox(self.groupBox)
+        self.memoryBudgetSpinBox.setObjectName(u"memoryBudgetSpinBox")
+        self.memoryBudgetSpinBox.setMinimum(64)
+        self.memoryBudgetSpinBox.setMaximum(1048576)
+        self.memoryBudgetSpinBox.setSingleStep(256)
+        self.memoryBudgetSpinBox.setValue(2048)
+
+        self.horizontalLayout_2.addWidget(self.memoryBudgetSpinBox)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout_2)
+
+        self.horizontalLayout_3 = QHBoxLayout()
+        self.horizontalLayout_3.setObjectName(u"horizontalLayout_3")
+        self.label_3 = QLabel(self.groupBox)
+        self.label_3.setObjectName(u"label_3")
+
+        self.horizontalLayout_3.addWidget(self.label_3)
+
+        self.downsampleXSpinBox = QSpinBox(self.groupBox)
+        self.downsampleXSpinBox.setObjectName(u"downsampleXSpinBox")
+        self.downsampleXSpinBox.setMinimum(1)
+        self.downsampleXSpinBox.setMaximum(16)
+
+        self.horizontalLayout_3.addWidget(self.downsampleXSpinBox)
+
+        self.downsampleYSpinBox = QSpinBox(self.groupBox)
+        self.downsampleYSpinBox.setObjectName(u"downsampleYSpinBox")
+        self.downsampleYSpinBox.setMinimum(1)
+        self.downsampleYSpinBox.setMaximum(16)
+
+        self.horizontalLayout_3.addWidget(self.downsampleYSpinBox)
+
+        self.downsampleZSpinBox = QSpinBox(self.groupBox)
+        self.downsampleZSpinBox.setObjectName(u"downsampleZSpinBox")
+        self.downsampleZSpinBox.setMinimum(1)
+        self.downsampleZSpinBox.setMaximum(16)
+
+        self.horizontalLayout_3.addWidget(self.downsampleZSpinBox)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout_3)
+
+        self.quantizeCheckBox = QCheckBox(self.groupBox)
+        self.quantizeCheckBox.setObjectName(u"quantizeCheckBox")
+
+        self.verticalLayout.addWidget(self.quantizeCheckBox)
+
+        self.planeTextureCheckBox = QCheckBox(self.groupBox)
+        self.planeTextureCheckBox.setObjectName(u"planeTextureCheckBox")
+
+        self.verticalLayout.addWidget(self.planeTextureCheckBox)
+
+        self.cacheImagesCheckBox = QCheckBox(self.groupBox)
+        self.cacheImagesCheckBox.setObjectName(u"cacheImagesCheckBox")
+
+        self.verticalLayout.addWidget(self.cacheImagesCheckBox)
+
+        self.compressCacheCheckBox = QCheckBox(self.groupBox)
+        self.compressCacheCheckBox.setObjectName(u"compressCacheCheckBox")
+
+        self.verticalLayout.addWidget(self.compressCacheCheckBox)
+
+        self.dicomSliceOrderCheckBox = QCheckBox(self.groupBox)
+        self.dicomSliceOrderCheckBox.setObjectName(u"dicomSliceOrderCheckBox")
+
+        self.verticalLayout.addWidget(self.dicomSliceOrderCheckBox)
+
+        self.pointCloudArrayCheckBox = QCheckBox(self.groupBox)
+        self.pointCloudArrayCheckBox.setObjectName(u"pointCloudArrayCheckBox")
+
+        self.verticalLayout.addWidget(self.pointCloudArrayCheckBox)
+
         self.verticalSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
 
         self.verticalLayout.addItem(self.verticalSpacer)
@@ -62,6 +153,8 @@ class Ui_ConfigureDialog(object):
 
 #if QT_CONFIG(shortcut)
         self.label.setBuddy(self.identifierLineEdit)
+        self.label_2.setBuddy(self.memoryBudgetSpinBox)
+        self.label_3.setBuddy(self.downsampleXSpinBox)
 #endif // QT_CONFIG(shortcut)
 
         self.retranslateUi(ConfigureDialog)
@@ -75,5 +168,46 @@ class Ui_ConfigureDialog(object):
         ConfigureDialog.setWindowTitle(QCoreApplication.translate("ConfigureDialog", u"Configure - Segmentation", None))
         self.groupBox.setTitle("")
         self.label.setText(QCoreApplication.translate("ConfigureDialog", u"Identifier:", None))
+#if QT_CONFIG(tooltip)
+        self.decodeInParallelCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Decode the image files in parallel before passing them to Zinc (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.decodeInParallelCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Decode images in parallel", None))
+#if QT_CONFIG(tooltip)
+        self.sparseLoadingCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Only load the slices that the image plane passes through, paging slices in and out as the plane moves (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.sparseLoadingCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Load slices on demand", None))
+        self.label_2.setText(QCoreApplication.translate("ConfigureDialog", u"Memory budget:", None))
+        self.memoryBudgetSpinBox.setSuffix(QCoreApplication.translate("ConfigureDialog", u" MB", None))
+#if QT_CONFIG(tooltip)
+        self.label_3.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Average blocks of pixels along each axis when the images are loaded (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_3.setText(QCoreApplication.translate("ConfigureDialog", u"Downsample (x, y, z):", None))
+        self.downsampleXSpinBox.setPrefix(QCoreApplication.translate("ConfigureDialog", u"x ", None))
+        self.downsampleYSpinBox.setPrefix(QCoreApplication.translate("ConfigureDialog", u"y ", None))
+        self.downsampleZSpinBox.setPrefix(QCoreApplication.translate("ConfigureDialog", u"z ", None))
+#if QT_CONFIG(tooltip)
+        self.quantizeCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Rescale the intensities of the images to 8 bits when they are loaded (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.quantizeCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Reduce images to 8 bits", None))
+#if QT_CONFIG(tooltip)
+        self.planeTextureCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Resample the images on the image plane and only pass that image to the graphics card instead of the whole volume (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.planeTextureCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Only upload the image plane", None))
+#if QT_CONFIG(tooltip)
+        self.cacheImagesCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Keep a copy of the decoded images with the step so that later loads do not decode them again, the copy takes as much disk space as the images take in memory (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.cacheImagesCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Cache the decoded images", None))
+#if QT_CONFIG(tooltip)
+        self.compressCacheCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Cache the decoded images as compressed bricks, only the bricks that the image plane passes through are decompressed (requires Pillow or pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.compressCacheCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Compress the image cache", None))
+#if QT_CONFIG(tooltip)
+        self.dicomSliceOrderCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Read the DICOM headers and order the slices by their position instead of by file name, this reorders the images of a step that already has points (requires pydicom)", None))
+#endif // QT_CONFIG(tooltip)
+        self.dicomSliceOrderCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Order DICOM slices by position", None))
+#if QT_CONFIG(tooltip)
+        self.pointCloudArrayCheckBox.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Output the point cloud as an (N, 3) NumPy array instead of a list of points", None))
+#endif // QT_CONFIG(tooltip)
+        self.pointCloudArrayCheckBox.setText(QCoreApplication.translate("ConfigureDialog", u"Output the point cloud as an array", None))
     # retranslateUi
 
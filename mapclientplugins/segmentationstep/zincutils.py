@@ -17,6 +17,8 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with MAP Client.  If not, see <http://www.gnu.org/licenses/>..
 '''
+import numpy as np
+
 from PySide6 import QtCore
 
 from cmlibs.zinc.sceneviewerinput import Sceneviewerinput
@@ -27,6 +29,8 @@ from cmlibs.zinc.graphics import Graphics
 
 from cmlibs.utils.zinc.finiteelement import create_cube_element
 
+from mapclientplugins.segmentationstep.maths.imageops import applyWindow
+
 COORDINATE_SYSTEM_LOCAL = SCENECOORDINATESYSTEM_LOCAL
 COORDINATE_SYSTEM_WINDOW_PIXEL_TOP_LEFT = SCENECOORDINATESYSTEM_WINDOW_PIXEL_TOP_LEFT
 
@@ -69,6 +73,40 @@ def createFiniteElement(region, finite_element_field, dim):
     fieldmodule.defineAllFaces()
     fieldmodule.endChange()
 
+def setImageFieldPixels(image_field, volume, window=None):
+    '''
+    Set a (z, y, x) volume of unsigned luminance values, with the rows
+    of each slice in file order, as the pixels of the image field.  If
+    a (low, high) intensity window is given the window is stretched
+    over the full range of the pixels.
+    '''
+    depth, height, width = volume.shape
+    # Zinc holds the rows of an image bottom up and reads each row from
+    # a whole number of 4 byte words, so flip the rows and pad the rows
+    # with copies of the last column then map the texture onto the
+    # original width.
+    padded_width = width
+    while (padded_width * volume.dtype.itemsize) % 4:
+        padded_width += 1
+    pixels = np.empty((depth, height, padded_width), dtype=volume.dtype.newbyteorder('='))
+    for index, slice_pixels in enumerate(volume):
+        if window is not None:
+            slice_pixels = applyWindow(slice_pixels, window)
+        pixels[index, :, :width] = slice_pixels[::-1]
+    pixels[:, :, width:] = pixels[:, :, width - 1:width]
+
+    # The window is applied one slice at a time and the padded pixels
+    # are released before Zinc copies the bytes, so there are never more
+    # than two copies of the volume alongside the volume itself.
+    buffer = pixels.tobytes()
+    del pixels
+
+    image_field.setSizeInPixels([padded_width, height, depth])
+    image_field.setPixelFormat(image_field.PIXEL_FORMAT_LUMINANCE)
+    image_field.setNumberOfBitsPerComponent(8 * volume.dtype.itemsize)
+    image_field.setBuffer(buffer)
+    image_field.setTextureCoordinateSizes([padded_width / float(width), 1.0, 1.0])
+
 def setGlyphPosition(glyph, position):
     if position is not None:
         position_field = glyph.getCoordinateField()